@@ -0,0 +1,163 @@
+"""
+Times degrees.py on a data directory, for tracking performance over time.
+
+Every storage is measured in a fresh process so its load time and peak
+memory are not affected by the others. Prints (or saves) one JSON document.
+
+Usage: python benchmark.py directory [--storage ...] [--search ...]
+       [--queries N] [--output FILE]
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import degrees
+
+
+def percentiles(seconds):
+    """
+    Returns the median, 90th and 99th percentile and maximum of a list of
+    durations, in milliseconds.
+    """
+    if not seconds:
+        return None
+    ms = sorted(s * 1000 for s in seconds)
+    if len(ms) == 1:
+        return {"p50": ms[0], "p90": ms[0], "p99": ms[0], "max": ms[0]}
+    cuts = statistics.quantiles(ms, n=100, method="inclusive")
+    return {"p50": cuts[49], "p90": cuts[89], "p99": cuts[98], "max": ms[-1]}
+
+
+def peak_rss():
+    """
+    Returns the peak resident memory of this process so far, in bytes,
+    or None where it can not be measured.
+    """
+    # Imported here as the module is POSIX only, and server.py imports
+    # this one on every platform
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(directory, storage, searches, queries, seed):
+    """
+    Loads directory with storage and times queries random pairs with each
+    search, returns the results as a dictionary.
+    """
+    start = time.perf_counter()
+    degrees.load_data(directory, storage)
+    load_seconds = time.perf_counter() - start
+    result = {"storage": storage, "load_seconds": load_seconds,
+              "peak_rss_after_load": peak_rss()}
+
+    if degrees.store is not None:
+        person_ids = list(degrees.store.person_ids)
+    else:
+        person_ids = list(degrees.people)
+    rng = random.Random(seed)
+    pairs = [(rng.choice(person_ids), rng.choice(person_ids))
+             for _ in range(queries)]
+
+    timings = []
+    for source, _ in pairs:
+        start = time.perf_counter()
+        degrees.neighbors_for_person(source)
+        timings.append(time.perf_counter() - start)
+    result["neighbors_ms"] = percentiles(timings)
+
+    start = time.perf_counter()
+    index = degrees.name_index()
+    result["name_index_seconds"] = time.perf_counter() - start
+    timings = []
+    for source, _ in pairs:
+        # The name with one letter dropped, as a typo
+        name = degrees.person_for_id(source)["name"]
+        cut = rng.randrange(len(name)) if name else 0
+        start = time.perf_counter()
+        index.fuzzy(name[:cut] + name[cut + 1:], 5)
+        timings.append(time.perf_counter() - start)
+    result["fuzzy_ms"] = percentiles(timings)
+
+    result["searches"] = {}
+    for search in searches:
+        if (search in ["alt", "parallel"]
+                and not isinstance(degrees.store, degrees.Graph)):
+            continue
+        if search == "alt":
+            degrees.load_landmarks(directory)
+        degrees.tree_cache.clear()
+        timings = []
+        connected = 0
+        for source, target in pairs:
+            start = time.perf_counter()
+            path = degrees.find_path(source, target, search)
+            timings.append(time.perf_counter() - start)
+            connected += path is not None
+        result["searches"][search] = {
+            "latency_ms": percentiles(timings), "connected": connected}
+
+    degrees.close_parallel_search()
+    result["peak_rss"] = peak_rss()
+    return result
+
+
+def run(directory, storages, searches, queries=100, seed=0):
+    """
+    Returns the benchmark document for directory, measuring each storage
+    in its own process.
+    """
+    # Not a multiprocessing.Pool, whose daemon workers could not start the
+    # workers of the parallel search
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for storage in storages:
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            results.append(pool.submit(
+                measure, directory, storage, searches, queries, seed).result())
+    return {
+        "directory": directory,
+        "queries": queries,
+        "seed": seed,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark loading and searching a degrees directory.")
+    parser.add_argument("directory")
+    parser.add_argument("--storage", nargs="+", choices=degrees.STORAGES,
+                        default=degrees.STORAGES)
+    parser.add_argument("--search", nargs="+", choices=sorted(degrees.SEARCHES),
+                        default=["bfs", "bidirectional"])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to write the JSON to")
+    args = parser.parse_args()
+
+    report = run(args.directory, args.storage, args.search,
+                 args.queries, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Cache of complete breadth first search trees, one per source person.
+
+Once the tree of a source is built, the shortest path from it to any target
+is found by walking the tree back from the target, so queries that share a
+source only pay for one search.
+"""
+
+import sys
+from collections import OrderedDict
+
+# Default bound on the estimated memory held by a BFSTreeCache, 256 MiB
+MAX_BYTES = 256 * 2 ** 20
+
+# Size of one (movie, parent, depth) entry of a tree
+ENTRY_BYTES = sys.getsizeof((None, None, 0))
+
+
+def bfs_tree(source, neighbors):
+    """
+    Returns a dict mapping everyone reachable from source to a
+    (movie, parent, depth) tuple, parent being one step closer to source.
+    The source maps to (None, None, 0).
+
+    neighbors is a function returning the (movie, person) pairs of a person.
+    """
+    tree = {source: (None, None, 0)}
+    frontier = [source]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for person in frontier:
+            for movie, neighbor in neighbors(person):
+                if neighbor not in tree:
+                    tree[neighbor] = (movie, person, depth)
+                    next_frontier.append(neighbor)
+        frontier = next_frontier
+    return tree
+
+
+def tree_bytes(tree):
+    """
+    Returns an estimate of the memory held by a tree from bfs_tree.
+    """
+    return sys.getsizeof(tree) + len(tree) * ENTRY_BYTES
+
+
+class BFSTreeCache():
+    """
+    Least recently used cache of trees from bfs_tree, keyed by source,
+    evicting the oldest trees whenever their total size exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.trees = OrderedDict()
+        self.bytes = 0
+
+    def __contains__(self, source):
+        return source in self.trees
+
+    def __len__(self):
+        return len(self.trees)
+
+    def clear(self):
+        self.trees.clear()
+        self.bytes = 0
+
+    def discard(self, source):
+        """
+        Removes the tree of source, if cached.
+        """
+        tree = self.trees.pop(source, None)
+        if tree is not None:
+            self.bytes -= tree_bytes(tree)
+
+    def invalidate(self, edges):
+        """
+        Drops the trees that new co-star edges could shorten paths in.
+
+        An edge between a and b leaves a tree valid if neither is in it, or
+        both are and their depths differ by at most one; otherwise someone
+        in the tree may now have a shorter path, so the tree is dropped.
+        """
+        for source in list(self.trees):
+            tree = self.trees[source]
+            for a, b in edges:
+                first = tree.get(a)
+                second = tree.get(b)
+                if first is None and second is None:
+                    continue
+                if first is None or second is None or abs(first[2] - second[2]) > 1:
+                    self.discard(source)
+                    break
+
+    def tree(self, source, neighbors):
+        """
+        Returns the tree of source, building and caching it if needed.
+        """
+        if source in self.trees:
+            self.trees.move_to_end(source)
+            return self.trees[source]
+
+        tree = bfs_tree(source, neighbors)
+        self.trees[source] = tree
+        self.bytes += tree_bytes(tree)
+
+        # Evict the least recently used, but always keep the newest tree
+        while self.bytes > self.max_bytes and len(self.trees) > 1:
+            _, old = self.trees.popitem(last=False)
+            self.bytes -= tree_bytes(old)
+        return tree
+
+    def shortest_path(self, source, target, neighbors):
+        """
+        Returns the shortest list of (movie, person) pairs from source to
+        target, or None if they are not connected.
+        """
+        tree = self.tree(source, neighbors)
+        if target not in tree:
+            return None
+        path = []
+        person = target
+        while person != source:
+            movie, parent, _ = tree[person]
+            path.append((movie, person))
+            person = parent
+        path.reverse()
+        return path
@@ -0,0 +1,142 @@
+"""
+Connected components of the co-star graph, kept as a union find structure.
+
+Two people are connected exactly when they have the same root, so pairs in
+different components can be rejected without searching at all.
+"""
+
+from array import array
+from collections import Counter
+
+from graph import INDEX
+
+
+class ComponentIndex():
+    """
+    Union find over people, with parent and size arrays indexed by person
+    index. key maps a person id to its index; without one the index keeps
+    its own dict of ids, filled by add.
+    """
+
+    def __init__(self, key=None):
+        self.keys = {} if key is None else None
+        self.key = self.keys.get if key is None else key
+        self.parent = array(INDEX)
+        self.size = array(INDEX)
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add(self, person_id=None):
+        """
+        Adds a new person in a component of their own, returns their index.
+        """
+        p = len(self.parent)
+        if self.keys is not None:
+            self.keys[person_id] = p
+        self.parent.append(p)
+        self.size.append(1)
+        return p
+
+    def find(self, p):
+        """
+        Returns the root of the component of person index p.
+        """
+        parent = self.parent
+        while parent[p] != p:
+            # Path halving, point p at its grandparent as we go
+            parent[p] = parent[parent[p]]
+            p = parent[p]
+        return p
+
+    def union(self, p, q):
+        """
+        Merges the components of person indices p and q, returns the new root.
+        """
+        p = self.find(p)
+        q = self.find(q)
+        if p == q:
+            return p
+        if self.size[p] < self.size[q]:
+            p, q = q, p
+        self.parent[q] = p
+        self.size[p] += self.size[q]
+        return p
+
+    def join(self, source, target):
+        """
+        Merges the components of the two person ids.
+        """
+        self.union(self.key(source), self.key(target))
+
+    def flatten(self):
+        """
+        Points everyone straight at their root, so find takes one step.
+        """
+        for p in range(len(self.parent)):
+            self.parent[p] = self.find(p)
+
+    def connected(self, source, target):
+        """
+        Returns True if the two person ids are in the same component.
+        """
+        return self.find(self.key(source)) == self.find(self.key(target))
+
+    def component_size(self, person_id):
+        """
+        Returns the number of people in the component of person_id.
+        """
+        return self.size[self.find(self.key(person_id))]
+
+    def statistics(self):
+        """
+        Returns a dictionary describing the component sizes: the number of
+        people and components, the largest size, the number of people in
+        no movie with anyone else, and how many components have each size.
+        """
+        sizes = Counter(
+            self.size[p] for p in range(len(self.parent)) if self.parent[p] == p)
+        return {
+            "people": len(self.parent),
+            "components": sum(sizes.values()),
+            "largest": max(sizes, default=0),
+            "isolated": sizes[1],
+            "sizes": dict(sorted(sizes.items(), reverse=True)),
+        }
+
+
+def graph_components(graph):
+    """
+    Returns the flattened ComponentIndex of a Graph, copied from the
+    snapshot it was mapped from if that saved one.
+    """
+    components = ComponentIndex(graph.person_index_for_id)
+    saved = getattr(graph, "component_parent", None)
+    if saved is not None:
+        components.parent.frombytes(saved.cast("B"))
+        components.size.frombytes(graph.component_size.cast("B"))
+        return components
+
+    components.parent = array(INDEX, range(graph.num_people()))
+    components.size = array(INDEX, [1]) * graph.num_people()
+    for m in range(graph.num_movies()):
+        stars = graph.stars_of(m)
+        for q in stars[1:]:
+            components.union(stars[0], q)
+    components.flatten()
+    return components
+
+
+def dict_components(people, movies):
+    """
+    Returns the flattened ComponentIndex of the people and movies dicts.
+    """
+    components = ComponentIndex()
+    for person_id in people:
+        components.add(person_id)
+    for movie in movies.values():
+        stars = [components.keys[person_id] for person_id in movie["stars"]]
+        for q in stars[1:]:
+            components.union(stars[0], q)
+    components.flatten()
+    return components
@@ -1,6 +1,21 @@
+import argparse
 import csv
+import json
+import multiprocessing
+import os
 import sys
+from collections import deque
 
+from cache import BFSTreeCache
+from components import dict_components, graph_components
+from graph import Graph, load_graph
+from nameindex import NameIndex
+from landmarks import (METHODS, alt_shortest_path, build_landmark_index,
+                       load_landmark_index)
+from parallel import ParallelBFS
+from paths import all_shortest_paths, count_shortest_paths, path_dag
+from snapshot import load_snapshot
+from sqlstore import DATABASE, SQLiteStore, load_database
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -12,11 +27,66 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Storage engine used instead of the dicts above, None when using the dicts
+store = None
 
-def load_data(directory):
+# Search trees of recent sources, used by cached_shortest_path
+tree_cache = BFSTreeCache()
+
+# Connected components of whichever data is loaded
+components = None
+
+# Prefix and fuzzy index of the names, built by name_index when first needed
+names_index = None
+
+# Landmark distances used by landmark_shortest_path, None until loaded
+landmark_index = None
+
+# Worker pool of parallel_shortest_path, None until first used
+parallel_search = None
+
+# True once ingest has changed the data since it was loaded
+ingested = False
+
+# Names of the storage engines that can be passed to load_data
+STORAGES = ["dict", "compact", "snapshot", "sqlite"]
+
+
+def load_data(directory, storage="dict"):
     """
     Load data from CSV files into memory.
+
+    storage "dict" fills the dicts above, "compact" loads an integer
+    indexed Graph into store instead, which takes a fraction of the memory.
+    "snapshot" memory maps a Graph compiled into a binary file in directory,
+    rebuilding the file first if the CSV files changed since. "sqlite"
+    imports the CSV files into a database in directory once, then fetches
+    everything from it on demand, keeping memory use bounded. The database
+    also keeps the rows ingested into it, the other storages forget them.
     """
+    global store, components, names_index, landmark_index, ingested
+    tree_cache.clear()
+    close_parallel_search()
+    names_index = None
+    landmark_index = None
+    ingested = False
+    names.clear()
+    people.clear()
+    movies.clear()
+    if storage == "compact":
+        store = load_graph(directory)
+        components = graph_components(store)
+        return
+    if storage == "snapshot":
+        store = load_snapshot(directory)
+        components = graph_components(store)
+        return
+    if storage == "sqlite":
+        store = load_database(directory)
+        components = store.components()
+        return
+    store = None
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -51,16 +121,200 @@ def load_data(directory):
             except KeyError:
                 pass
 
+    components = dict_components(people, movies)
+
+
+def ingest(directory):
+    """
+    Adds the people, movies and stars in the CSV files of directory, any
+    of which may be missing, to the data already loaded. Rows whose ids are
+    already taken and stars of unknown people or movies are skipped.
+
+    Updates the components and name index in place and drops only the
+    cached search trees the new stars could change, so the cost depends on
+    the size of the new files rather than of the whole data.
+    Returns the number of people, movies and stars added.
+    """
+    global landmark_index, ingested
+    added = [0, 0, 0]
+
+    for row in delta_rows(directory, "people.csv"):
+        added[0] += add_person(row["id"], row["name"], row["birth"])
+    for row in delta_rows(directory, "movies.csv"):
+        added[1] += add_movie(row["id"], row["title"], row["year"])
+
+    # Pairs of people who now share a movie
+    edges = []
+    for row in delta_rows(directory, "stars.csv"):
+        co_stars = add_star(row["person_id"], row["movie_id"])
+        if co_stars is not None:
+            added[2] += 1
+            edges.extend((row["person_id"], co_star) for co_star in co_stars)
+
+    if isinstance(store, SQLiteStore):
+        store.commit(directory)
+    tree_cache.invalidate(edges)
+    # New stars can shorten distances, so the landmark bounds may be too high
+    if added[2]:
+        landmark_index = None
+        close_parallel_search()
+    ingested = ingested or any(added)
+    return tuple(added)
+
+
+def load_worker(directory, storage="dict", ingests=()):
+    """
+    Initializer of worker processes that are not forked: loads directory
+    and ingests the same directories the main process did, in order.
+    The sqlite database already holds the ingested rows, so it is only
+    opened, never imported or written to by the workers.
+    """
+    global store, components
+    if storage == "sqlite":
+        store = SQLiteStore(os.path.join(directory, DATABASE))
+        components = store.components()
+        return
+    load_data(directory, storage)
+    for ingest_directory in ingests:
+        ingest(ingest_directory)
+
+
+def delta_rows(directory, name):
+    """
+    Yields the rows of a CSV file in directory, none if it does not exist.
+    """
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def add_person(person_id, name, birth):
+    """
+    Adds a new person, returns False if the id is already taken.
+    """
+    if store is not None:
+        if not store.add_person(person_id, name, birth):
+            return False
+    elif person_id in people:
+        return False
+    else:
+        people[person_id] = {"name": name, "birth": birth, "movies": set()}
+        names.setdefault(name.lower(), set()).add(person_id)
+    components.add(person_id)
+    if names_index is not None:
+        names_index.add(name.lower())
+    return True
+
+
+def add_movie(movie_id, title, year):
+    """
+    Adds a new movie, returns False if the id is already taken.
+    """
+    if store is not None:
+        return store.add_movie(movie_id, title, year)
+    if movie_id in movies:
+        return False
+    movies[movie_id] = {"title": title, "year": year, "stars": set()}
+    return True
+
+
+def add_star(person_id, movie_id):
+    """
+    Records that a person starred in a movie. Returns the other stars of
+    the movie, or None if the person or movie is unknown or the star is
+    already recorded.
+    """
+    if store is not None:
+        if not store.add_star(person_id, movie_id):
+            return None
+    elif (person_id not in people or movie_id not in movies
+            or movie_id in people[person_id]["movies"]):
+        return None
+    else:
+        people[person_id]["movies"].add(movie_id)
+        movies[movie_id]["stars"].add(person_id)
+
+    co_stars = [star for star in stars_for_movie(movie_id) if star != person_id]
+    if co_stars:
+        components.join(person_id, co_stars[0])
+    return co_stars
+
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        description="Find the degrees of separation between two people.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--storage", choices=STORAGES, default="dict",
+                        help="how to hold the data in memory")
+    parser.add_argument("--search", choices=sorted(SEARCHES), default="bfs",
+                        help="shortest path algorithm to use")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer every pair of names in a CSV file, - for stdin")
+    parser.add_argument("--workers", type=int,
+                        help="processes answering batch queries or running the parallel "
+                        "search, defaults to one per core")
+    parser.add_argument("--ingest", action="append", default=[], metavar="DIR",
+                        help="add the people, movies and stars in DIR after loading")
+    parser.add_argument("--all-paths", type=int, metavar="N",
+                        help="count the shortest paths and print up to N of them")
+    parser.add_argument("--stats", action="store_true",
+                        help="print the sizes of the connected components and exit")
+    parser.add_argument("--landmarks", type=int, default=16,
+                        help="number of landmarks for the alt search")
+    parser.add_argument("--landmark-method", choices=METHODS, default="degree",
+                        help="how the alt search picks its landmarks")
+    parser.add_argument("--cache-bytes", type=int, default=tree_cache.max_bytes,
+                        help="memory bound of the cached search trees")
+    args = parser.parse_args()
+    tree_cache.max_bytes = args.cache_bytes
+
+    # Keep stdout for the results in batch mode
+    log = sys.stderr if args.batch else sys.stdout
 
     # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    print("Loading data...", file=log)
+    load_data(args.directory, args.storage)
+    print("Data loaded.", file=log)
+
+    for directory in args.ingest:
+        people_added, movies_added, stars_added = ingest(directory)
+        print(f"Added {people_added} people, {movies_added} movies and "
+              f"{stars_added} stars from {directory}.", file=log)
+
+    if args.stats:
+        stats = components.statistics()
+        print(f"{stats['people']} people in {stats['components']} components.")
+        print(f"Largest component: {stats['largest']} people.")
+        print(f"People in no movie with anyone else: {stats['isolated']}.")
+        for size, count in stats["sizes"].items():
+            print(f"{count} components of {size} people")
+        return
+
+    if args.search == "alt":
+        if not isinstance(store, Graph):
+            sys.exit("The alt search needs --storage compact or snapshot.")
+        print("Loading landmarks...", file=log)
+        load_landmarks(args.directory, args.landmarks, args.landmark_method)
+
+    workers = args.workers
+    if args.search == "parallel":
+        if not isinstance(store, Graph):
+            sys.exit("The parallel search needs --storage compact or snapshot.")
+        # The workers split each search, so batches are answered one by one
+        start_parallel_search(workers)
+        workers = 1
+
+    if args.batch:
+        if args.batch == "-":
+            run_batch(csv.reader(sys.stdin), args.search, workers,
+                      args.directory, args.storage, args.ingest)
+        else:
+            with open(args.batch, encoding="utf-8", newline="") as f:
+                run_batch(csv.reader(f), args.search, workers,
+                          args.directory, args.storage, args.ingest)
+        return
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -69,7 +323,11 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if args.all_paths is not None:
+        print_all_paths(source, target, args.all_paths)
+        return
+
+    path = find_path(source, target, args.search)
 
     if path is None:
         print("Not connected.")
@@ -78,12 +336,103 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person_for_id(path[i][1])["name"]
+            person2 = person_for_id(path[i + 1][1])["name"]
+            movie = movie_for_id(path[i + 1][0])["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
+def print_all_paths(source, target, limit):
+    """
+    Prints the number of shortest paths and the first limit of them.
+    """
+    # The count and the paths both come from the same search
+    dag = ({}, {})
+    if components is None or components.connected(source, target):
+        dag = path_dag(source, target, neighbors_for_person)
+    count = dag[1].get(target, 0)
+    if count == 0:
+        print("Not connected.")
+        return
+    print(f"Number of shortest paths: {count}.")
+    paths = all_shortest_paths(source, target, neighbors_for_person, dag)
+    for i, path in zip(range(limit), paths):
+        steps = [person_for_id(source)["name"]]
+        for movie_id, person_id in path:
+            steps.append(f"({movie_for_id(movie_id)['title']})")
+            steps.append(person_for_id(person_id)["name"])
+        print(f"{i + 1}: {' '.join(steps)}")
+
+
+def run_batch(pairs, search="bfs", workers=None, directory=None,
+              storage="dict", ingests=(), output=None):
+    """
+    Answers every (name, name) pair in pairs, writing one JSON line per
+    pair to output, standard output by default, in the same order.
+
+    The data must already be loaded. Queries are spread over a pool of
+    worker processes; where fork is available the workers share the loaded
+    data copy on write, otherwise each worker loads directory and ingests
+    the ingests directories itself.
+    """
+    if output is None:
+        output = sys.stdout
+    queries = ((row, search) for row in pairs if row)
+    if workers == 1:
+        for result in map(answer_query, queries):
+            print(json.dumps(result), file=output)
+        return
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        pool = multiprocessing.get_context("fork").Pool(workers)
+    else:
+        pool = multiprocessing.Pool(
+            workers, initializer=load_worker,
+            initargs=(directory, storage, ingests))
+    with pool:
+        for result in pool.imap(answer_query, queries, chunksize=16):
+            print(json.dumps(result), file=output)
+
+
+def answer_query(query):
+    """
+    Takes a (row, search) pair, row being a [source name, target name]
+    list, and returns a dictionary with the names and either the degrees
+    and path between them, or an error.
+    """
+    row, search = query
+    if len(row) != 2:
+        return {"error": "Expected two names.", "row": row}
+    result = {"source": row[0], "target": row[1]}
+
+    person_ids = []
+    for name in row:
+        matches = person_ids_for_name(name)
+        if len(matches) != 1:
+            result["error"] = (f"Person not found: {name}." if not matches
+                               else f"Ambiguous name: {name}.")
+            return result
+        person_ids.append(matches[0])
+
+    path = find_path(*person_ids, search)
+    if path is None:
+        result["error"] = "Not connected."
+    else:
+        result["degrees"] = len(path)
+        result["path"] = path
+    return result
+
+
+def find_path(source, target, search="bfs"):
+    """
+    Returns the path found by the named search, or None straight away if
+    the source and target are in different components.
+    """
+    if components is not None and not components.connected(source, target):
+        return None
+    return SEARCHES[search](source, target)
+
+
 def shortest_path(source, target):
     """
     Returns the shortest list of (movie_id, person_id) pairs
@@ -93,6 +442,8 @@ def shortest_path(source, target):
 
     Uses breadth first search
     """
+    if isinstance(store, Graph):
+        return store.shortest_path(source, target)
 
     # Initialize frontier to just the starting position
     # Each node has the current actor as state, the parent as another node, with the action the movie that connects the parent and child
@@ -131,18 +482,221 @@ def shortest_path(source, target):
                 frontier.add(child)
 
 
+def bidirectional_shortest_path(source, target):
+    """
+    Returns the same as shortest_path, but searches from both the source
+    and the target at once, one whole layer at a time, always growing the
+    smaller frontier. Stops after the first layer that reaches a person
+    already reached from the other side.
+    """
+    if source == target:
+        return []
+
+    # Each side maps reached people to (movie, parent, depth), the parent
+    # being one step closer to that side's starting person
+    forward = {source: (None, None, 0)}
+    backward = {target: (None, None, 0)}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meet = expand_layer(
+                forward_frontier, forward, backward)
+        else:
+            backward_frontier, meet = expand_layer(
+                backward_frontier, backward, forward)
+
+        if meet is not None:
+            # Source side: walk back from meet to source then reverse
+            path = []
+            person = meet
+            while forward[person][1] is not None:
+                movie, parent, _ = forward[person]
+                path.append((movie, person))
+                person = parent
+            path.reverse()
+
+            # Target side: each step already points towards the target
+            person = meet
+            while backward[person][1] is not None:
+                movie, person, _ = backward[person]
+                path.append((movie, person))
+            return path
+
+    return None
+
+
+def expand_layer(frontier, reached, other):
+    """
+    Expands every person in frontier, adding the newly reached people to
+    reached. Returns the next frontier and the newly reached person that
+    is closest to the other side's start, None if no new person was
+    already reached by the other side.
+    """
+    next_frontier = []
+    meet = None
+    for person in frontier:
+        depth = reached[person][2] + 1
+        for movie, neighbor in neighbors_for_person(person):
+            if neighbor in reached:
+                continue
+            reached[neighbor] = (movie, person, depth)
+            next_frontier.append(neighbor)
+            # Keep the meeting point that leaves the shortest remaining path
+            if neighbor in other and (
+                    meet is None or other[neighbor][2] < other[meet][2]):
+                meet = neighbor
+    return next_frontier, meet
+
+
+def pruned_shortest_path(source, target):
+    """
+    Returns the same as shortest_path, treating the data as a graph of
+    people and movies: a movie's stars are walked only the first time one
+    of them is expanded, as by then all of them have been reached.
+    """
+    if isinstance(store, Graph):
+        return store.pruned_shortest_path(source, target)
+    if source == target:
+        return []
+
+    # Maps each reached person to the (movie, person) they were reached from
+    parents = {source: None}
+    expanded = set()
+    queue = deque([source])
+    while queue:
+        person = queue.popleft()
+        for movie in movies_for_person(person):
+            if movie in expanded:
+                continue
+            expanded.add(movie)
+            for star in stars_for_movie(movie):
+                if star in parents:
+                    continue
+                parents[star] = (movie, person)
+                if star == target:
+                    path = []
+                    while parents[star] is not None:
+                        movie, parent = parents[star]
+                        path.append((movie, star))
+                        star = parent
+                    path.reverse()
+                    return path
+                queue.append(star)
+    return None
+
+
+def cached_shortest_path(source, target):
+    """
+    Returns the same as shortest_path, using the complete search tree of
+    source from tree_cache, so later queries from the same source only
+    walk back from their target.
+    """
+    return tree_cache.shortest_path(source, target, neighbors_for_person)
+
+
+def shortest_paths(source, target):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that connect
+    the source to the target, generating them one at a time.
+    """
+    if components is not None and not components.connected(source, target):
+        return iter(())
+    return all_shortest_paths(source, target, neighbors_for_person)
+
+
+def count_paths(source, target):
+    """
+    Returns the number of shortest paths between the source and target.
+    """
+    if components is not None and not components.connected(source, target):
+        return 0
+    return count_shortest_paths(source, target, neighbors_for_person)
+
+
+def parallel_shortest_path(source, target):
+    """
+    Returns the same as shortest_path, expanding each level of the search
+    in a pool of worker processes sharing the graph's arrays. Needs the
+    data loaded with the compact or snapshot storage.
+    """
+    return start_parallel_search().shortest_path(source, target)
+
+
+def start_parallel_search(workers=None):
+    """
+    Starts the workers of parallel_shortest_path, one per core by default,
+    unless already started. Returns the ParallelBFS.
+    """
+    global parallel_search
+    if not isinstance(store, Graph):
+        raise Exception("parallel search needs a Graph")
+    if parallel_search is None:
+        parallel_search = ParallelBFS(store, workers)
+    return parallel_search
+
+
+def close_parallel_search():
+    """
+    Stops the workers of parallel_shortest_path, if started.
+    """
+    global parallel_search
+    if parallel_search is not None:
+        parallel_search.close()
+        parallel_search = None
+
+
+def load_landmarks(directory, count=16, method="degree"):
+    """
+    Loads the landmark index of directory for landmark_shortest_path,
+    computing and saving it next to the CSV files the first time.
+    Needs the data loaded with the compact or snapshot storage. After
+    ingest the saved distances are out of date, so they are recomputed.
+    """
+    global landmark_index
+    if ingested:
+        landmark_index = build_landmark_index(store, count, method)
+    else:
+        landmark_index = load_landmark_index(store, directory, count, method)
+
+
+def landmark_shortest_path(source, target):
+    """
+    Returns the same as shortest_path, using A* with lower bounds from
+    the distances to the landmarks loaded by load_landmarks.
+    """
+    if landmark_index is None:
+        raise Exception("landmarks not loaded")
+    return alt_shortest_path(store, landmark_index, source, target)
+
+
+# Shortest path algorithms that can be chosen from the command line
+SEARCHES = {
+    "bfs": shortest_path,
+    "bidirectional": bidirectional_shortest_path,
+    "cached": cached_shortest_path,
+    "pruned": pruned_shortest_path,
+    "parallel": parallel_shortest_path,
+    "alt": landmark_shortest_path,
+}
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = person_ids_for_name(name)
     if len(person_ids) == 0:
+        suggestions = suggest_names(name)
+        if suggestions:
+            print(f"No '{name}', did you mean: {', '.join(suggestions)}?")
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
+            person = person_for_id(person_id)
             name = person["name"]
             birth = person["birth"]
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
@@ -157,11 +711,86 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def person_ids_for_name(name):
+    """
+    Returns the list of IMDB ids of everyone with the given name.
+    """
+    if store is not None:
+        return store.person_ids_for_name(name)
+    return list(names.get(name.lower(), set()))
+
+
+def name_index():
+    """
+    Returns the NameIndex of every loaded name, building it on first use.
+    """
+    global names_index
+    if names_index is None:
+        names_index = NameIndex(
+            store.lower_names() if store is not None else names.keys())
+    return names_index
+
+
+def person_ids_for_prefix(prefix, limit=10):
+    """
+    Returns the IMDB ids of the people whose name starts with prefix,
+    for up to limit distinct names.
+    """
+    return [person_id for name in name_index().prefix(prefix, limit)
+            for person_id in person_ids_for_name(name)]
+
+
+def suggest_names(name, limit=5):
+    """
+    Returns up to limit names of people close to name, allowing for typos.
+    """
+    return [person_for_id(person_ids_for_name(match)[0])["name"]
+            for match in name_index().fuzzy(name, limit)]
+
+
+def person_for_id(person_id):
+    """
+    Returns a dictionary with the name and birth of a person.
+    """
+    if store is not None:
+        return store.person_for_id(person_id)
+    return people[person_id]
+
+
+def movie_for_id(movie_id):
+    """
+    Returns a dictionary with the title and year of a movie.
+    """
+    if store is not None:
+        return store.movie_for_id(movie_id)
+    return movies[movie_id]
+
+
+def movies_for_person(person_id):
+    """
+    Returns the movie_ids a person starred in.
+    """
+    if store is not None:
+        return store.movies_for_person(person_id)
+    return people[person_id]["movies"]
+
+
+def stars_for_movie(movie_id):
+    """
+    Returns the person_ids that starred in a movie.
+    """
+    if store is not None:
+        return store.stars_for_movie(movie_id)
+    return movies[movie_id]["stars"]
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if store is not None:
+        return store.neighbors_for_person(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -0,0 +1,92 @@
+"""
+Exports the co-star network within some number of hops of a person as an
+edge list, for loading into other graph tools.
+
+Edges are written as they are found by a breadth first search, so the
+export starts straight away and only the people reached and the movies
+walked are held in memory, however many edges there are.
+
+Usage: python ego.py directory name [--hops K] [--max-edges N]
+       [--output FILE] [--storage ...]
+"""
+
+import argparse
+import csv
+import itertools
+import sys
+
+import degrees
+
+
+def ego_edges(source, hops):
+    """
+    Yields a (person_id, movie_id, person_id) triple for every pair of
+    people within hops of source who starred in a movie together, each
+    pair and movie once.
+    """
+    visited = {source}
+    walked = set()
+    frontier = [source]
+    for depth in range(hops + 1):
+        next_frontier = []
+        for person in frontier:
+            for movie in degrees.movies_for_person(person):
+                if movie in walked:
+                    continue
+                walked.add(movie)
+                cast = list(degrees.stars_for_movie(movie))
+                if depth < hops:
+                    # The whole cast is at most one hop further
+                    for star in cast:
+                        if star not in visited:
+                            visited.add(star)
+                            next_frontier.append(star)
+                else:
+                    # On the last layer only pairs of people already reached
+                    cast = [star for star in cast if star in visited]
+                for a, b in itertools.combinations(cast, 2):
+                    yield a, movie, b
+        frontier = next_frontier
+
+
+def write_ego(output, source, hops, max_edges=None):
+    """
+    Writes the edges of ego_edges to output as CSV, stopping after
+    max_edges if given. Returns the number of edges written.
+    """
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(["person_id", "movie_id", "co_star_id"])
+    count = 0
+    for edge in itertools.islice(ego_edges(source, hops), max_edges):
+        writer.writerow(edge)
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the co-star network around a person as CSV.")
+    parser.add_argument("directory")
+    parser.add_argument("name")
+    parser.add_argument("--hops", type=int, default=1)
+    parser.add_argument("--max-edges", type=int, metavar="N",
+                        help="stop after writing N edges")
+    parser.add_argument("--output", help="file to write, defaults to stdout")
+    parser.add_argument("--storage", choices=degrees.STORAGES, default="dict")
+    args = parser.parse_args()
+
+    degrees.load_data(args.directory, args.storage)
+    person_ids = degrees.person_ids_for_name(args.name)
+    if len(person_ids) != 1:
+        sys.exit("Person not found." if not person_ids else "Ambiguous name.")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            count = write_ego(f, person_ids[0], args.hops, args.max_edges)
+    else:
+        count = write_ego(sys.stdout, person_ids[0], args.hops, args.max_edges)
+    print(f"Wrote {count} edges.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
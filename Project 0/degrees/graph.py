@@ -0,0 +1,461 @@
+"""
+Compact integer-indexed storage for the degrees data.
+
+People and movies are interned to dense integers and the person -> movie
+and movie -> person adjacency is held in compressed sparse row (CSR) form,
+so the whole graph lives in a handful of flat arrays instead of one dict
+and one set per record. Ids, names and titles are likewise packed into one
+utf-8 blob per column, and found by binary search over sorted orders
+rather than through dicts.
+"""
+
+import csv
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+
+# Typecode of every index array, 4 byte signed ints
+INDEX = "i"
+
+# Typecode of string offsets, 8 byte signed ints
+OFFSET = "q"
+
+
+class StringTable():
+    """
+    Sequence of strings stored as one utf-8 blob, string i being
+    data[offsets[i]:offsets[i + 1]]. Strings are decoded on access.
+    Appended strings are kept in a list after the blob's.
+    """
+
+    def __init__(self, offsets=None, data=b""):
+        self.offsets = array(OFFSET, [0]) if offsets is None else offsets
+        self.data = data
+        self.size = len(self.offsets) - 1
+        self.extra = []
+
+    def __len__(self):
+        return self.size + len(self.extra)
+
+    def __getitem__(self, i):
+        if i >= self.size:
+            return self.extra[i - self.size]
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def append(self, string):
+        self.extra.append(string)
+
+
+def string_table(strings):
+    """
+    Returns a StringTable of strings.
+    """
+    offsets = array(OFFSET, [0])
+    data = bytearray()
+    for string in strings:
+        data += string.encode("utf-8")
+        offsets.append(len(data))
+    return StringTable(offsets, bytes(data))
+
+
+def sorted_order(strings):
+    """
+    Returns the indices of strings, a list, sorted by string.
+    """
+    return array(INDEX, sorted(range(len(strings)), key=strings.__getitem__))
+
+
+def find_id(order, ids, key):
+    """
+    Returns the index whose id is key, order listing the indices sorted by
+    id, or None if no index has that id.
+    """
+    i = bisect_left(order, key, key=ids.__getitem__)
+    if i < len(order) and ids[order[i]] == key:
+        return order[i]
+    return None
+
+
+class Graph():
+    """
+    People and movies stored as indices 0..n-1. The movies of person p are
+    person_movies[person_offsets[p]:person_offsets[p + 1]] and the stars of
+    movie m are movie_people[movie_offsets[m]:movie_offsets[m + 1]].
+
+    Offers the same lookups as the dicts in degrees.py, keyed by IMDb id,
+    as well as the integer level methods used by the search algorithms.
+    """
+
+    def __init__(self):
+        # Index -> IMDb id, name and birth of each person
+        self.person_ids = StringTable()
+        self.person_names = StringTable()
+        self.person_births = StringTable()
+
+        # Index -> IMDb id, title and year of each movie
+        self.movie_ids = StringTable()
+        self.movie_titles = StringTable()
+        self.movie_years = StringTable()
+
+        # Indices sorted by IMDb id, and person indices sorted by lowercase
+        # name along with those names
+        self.person_id_order = array(INDEX)
+        self.movie_id_order = array(INDEX)
+        self.name_order = array(INDEX)
+        self.sorted_names = StringTable()
+
+        # IMDb id -> index, of those added after the sorted orders were built
+        self.person_index = {}
+        self.movie_index = {}
+
+        # Lowercase name -> list of person indices, likewise
+        self.names = {}
+
+        # CSR adjacency in both directions
+        self.person_offsets = array(INDEX, [0])
+        self.person_movies = array(INDEX)
+        self.movie_offsets = array(INDEX, [0])
+        self.movie_people = array(INDEX)
+
+        # Adjacency added since the CSR arrays were built, index -> list
+        self.extra_movies = {}
+        self.extra_stars = {}
+
+    def num_people(self):
+        return len(self.person_ids)
+
+    def num_movies(self):
+        return len(self.movie_ids)
+
+    def movies_of(self, p):
+        """
+        Returns the movie indices person index p starred in.
+        """
+        extra = self.extra_movies.get(p)
+        if extra is None:
+            return self.person_movies[self.person_offsets[p]:self.person_offsets[p + 1]]
+        if p + 1 < len(self.person_offsets):
+            return list(self.person_movies[
+                self.person_offsets[p]:self.person_offsets[p + 1]]) + extra
+        return extra
+
+    def stars_of(self, m):
+        """
+        Returns the person indices that starred in movie index m.
+        """
+        extra = self.extra_stars.get(m)
+        if extra is None:
+            return self.movie_people[self.movie_offsets[m]:self.movie_offsets[m + 1]]
+        if m + 1 < len(self.movie_offsets):
+            return list(self.movie_people[
+                self.movie_offsets[m]:self.movie_offsets[m + 1]]) + extra
+        return extra
+
+    def neighbors(self, p):
+        """
+        Yields (movie, person) index pairs for everyone who starred
+        with person index p, including p itself.
+        """
+        for m in self.movies_of(p):
+            for q in self.stars_of(m):
+                yield m, q
+
+    def person_index_for_id(self, person_id):
+        if person_id in self.person_index:
+            return self.person_index[person_id]
+        return find_id(self.person_id_order, self.person_ids, person_id)
+
+    def movie_index_for_id(self, movie_id):
+        if movie_id in self.movie_index:
+            return self.movie_index[movie_id]
+        return find_id(self.movie_id_order, self.movie_ids, movie_id)
+
+    def person_ids_for_name(self, name):
+        """
+        Returns the list of IMDb ids of the people called name (any case).
+        """
+        lower = name.lower()
+        start = bisect_left(self.sorted_names, lower)
+        end = bisect_right(self.sorted_names, lower, lo=start)
+        return [self.person_ids[p] for p in
+                list(self.name_order[start:end]) + self.names.get(lower, [])]
+
+    def lower_names(self):
+        """
+        Yields every distinct name, in lowercase.
+        """
+        # Sorted, so repeats are next to each other
+        previous = None
+        for i in range(len(self.sorted_names)):
+            name = self.sorted_names[i]
+            if name != previous:
+                yield name
+            previous = name
+        yield from self.names
+
+    def person_for_id(self, person_id):
+        p = self.person_index_for_id(person_id)
+        return {"name": self.person_names[p], "birth": self.person_births[p]}
+
+    def movie_for_id(self, movie_id):
+        m = self.movie_index_for_id(movie_id)
+        return {"title": self.movie_titles[m], "year": self.movie_years[m]}
+
+    def neighbors_for_person(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        return {
+            (self.movie_ids[m], self.person_ids[q])
+            for m, q in self.neighbors(self.person_index_for_id(person_id))
+        }
+
+    def movies_for_person(self, person_id):
+        return [self.movie_ids[m]
+                for m in self.movies_of(self.person_index_for_id(person_id))]
+
+    def stars_for_movie(self, movie_id):
+        return [self.person_ids[p]
+                for p in self.stars_of(self.movie_index_for_id(movie_id))]
+
+    def add_person(self, person_id, name, birth):
+        """
+        Adds a new person, returns False if the id is already taken.
+        """
+        if self.person_index_for_id(person_id) is not None:
+            return False
+        p = self.num_people()
+        self.person_index[person_id] = p
+        self.person_ids.append(person_id)
+        self.person_names.append(name)
+        self.person_births.append(birth)
+        self.names.setdefault(name.lower(), []).append(p)
+        self.extra_movies[p] = []
+        return True
+
+    def add_movie(self, movie_id, title, year):
+        """
+        Adds a new movie, returns False if the id is already taken.
+        """
+        if self.movie_index_for_id(movie_id) is not None:
+            return False
+        m = self.num_movies()
+        self.movie_index[movie_id] = m
+        self.movie_ids.append(movie_id)
+        self.movie_titles.append(title)
+        self.movie_years.append(year)
+        self.extra_stars[m] = []
+        return True
+
+    def add_star(self, person_id, movie_id):
+        """
+        Records that a person starred in a movie, returns False if either
+        is unknown or the star is already recorded.
+        """
+        p = self.person_index_for_id(person_id)
+        m = self.movie_index_for_id(movie_id)
+        if p is None or m is None or m in self.movies_of(p):
+            return False
+        self.extra_movies.setdefault(p, []).append(m)
+        self.extra_stars.setdefault(m, []).append(p)
+        return True
+
+    def compact(self):
+        """
+        Folds the adjacency added since the CSR arrays were built into new
+        CSR arrays, for code that reads the arrays directly.
+        """
+        if not self.extra_movies and not self.extra_stars:
+            return
+        person_offsets, person_movies = array(INDEX, [0]), array(INDEX)
+        for p in range(self.num_people()):
+            person_movies.extend(self.movies_of(p))
+            person_offsets.append(len(person_movies))
+        movie_offsets, movie_people = array(INDEX, [0]), array(INDEX)
+        for m in range(self.num_movies()):
+            movie_people.extend(self.stars_of(m))
+            movie_offsets.append(len(movie_people))
+        self.person_offsets, self.person_movies = person_offsets, person_movies
+        self.movie_offsets, self.movie_people = movie_offsets, movie_people
+        self.extra_movies = {}
+        self.extra_stars = {}
+
+    def path_from_parents(self, parent, via, target):
+        """
+        Follows the parent and via (movie) arrays back from target to the
+        source, whose parent is itself, and returns the list of
+        (movie_id, person_id) pairs leading from the source to target.
+        """
+        path = []
+        p = target
+        while parent[p] != p:
+            path.append((self.movie_ids[via[p]], self.person_ids[p]))
+            p = parent[p]
+        path.reverse()
+        return path
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, or None if there is none.
+
+        Breadth first search over the person indices, with the explored
+        set and the tree kept as flat arrays indexed by person.
+        """
+        s = self.person_index_for_id(source)
+        t = self.person_index_for_id(target)
+        if s == t:
+            return []
+
+        # parent[p] is the person p was reached from, -1 if not reached yet
+        parent = array(INDEX, [-1]) * self.num_people()
+        via = array(INDEX, [-1]) * self.num_people()
+        parent[s] = s
+
+        queue = deque([s])
+        while queue:
+            p = queue.popleft()
+            for m, q in self.neighbors(p):
+                if parent[q] == -1:
+                    parent[q] = p
+                    via[q] = m
+                    # Every node in a later layer is further away, so can stop now
+                    if q == t:
+                        return self.path_from_parents(parent, via, t)
+                    queue.append(q)
+        return None
+
+    def pruned_shortest_path(self, source, target):
+        """
+        Returns the same as shortest_path, but walks the cast of each movie
+        only once per search: the first time any of its stars is expanded.
+        """
+        s = self.person_index_for_id(source)
+        t = self.person_index_for_id(target)
+        if s == t:
+            return []
+
+        parent = array(INDEX, [-1]) * self.num_people()
+        via = array(INDEX, [-1]) * self.num_people()
+        expanded = bytearray(self.num_movies())
+        parent[s] = s
+
+        queue = deque([s])
+        while queue:
+            p = queue.popleft()
+            for m in self.movies_of(p):
+                if expanded[m]:
+                    continue
+                expanded[m] = 1
+                for q in self.stars_of(m):
+                    if parent[q] == -1:
+                        parent[q] = p
+                        via[q] = m
+                        if q == t:
+                            return self.path_from_parents(parent, via, t)
+                        queue.append(q)
+        return None
+
+
+def build_csr(rows, pairs, n):
+    """
+    Takes a sequence of (row, column) pairs as two flat arrays and the
+    number of rows n, returns the (offsets, columns) CSR arrays with each
+    row's columns sorted and duplicates removed.
+    """
+    counts = array(INDEX, [0]) * (n + 1)
+    for r in rows:
+        counts[r + 1] += 1
+    for r in range(n):
+        counts[r + 1] += counts[r]
+
+    # Scatter every column into its row's slot
+    columns = array(INDEX, [0]) * len(rows)
+    fill = array(INDEX, counts)
+    for r, c in zip(rows, pairs):
+        columns[fill[r]] = c
+        fill[r] += 1
+
+    # Sort each row and drop repeated pairs, compacting in place
+    offsets = array(INDEX, [0]) * (n + 1)
+    end = 0
+    for r in range(n):
+        row = sorted(set(columns[counts[r]:counts[r + 1]]))
+        columns[end:end + len(row)] = array(INDEX, row)
+        end += len(row)
+        offsets[r + 1] = end
+    del columns[end:]
+    return offsets, columns
+
+
+def load_graph(directory):
+    """
+    Loads the CSV files in directory into a new Graph.
+    """
+    graph = Graph()
+
+    # Load people, a repeated id replaces the earlier row as in the dicts
+    person_index = {}
+    person_ids, person_names, person_births = [], [], []
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            p = person_index.setdefault(row["id"], len(person_ids))
+            if p == len(person_ids):
+                person_ids.append(row["id"])
+                person_names.append(row["name"])
+                person_births.append(row["birth"])
+            else:
+                person_names[p] = row["name"]
+                person_births[p] = row["birth"]
+
+    # Load movies
+    movie_index = {}
+    movie_ids, movie_titles, movie_years = [], [], []
+    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            m = movie_index.setdefault(row["id"], len(movie_ids))
+            if m == len(movie_ids):
+                movie_ids.append(row["id"])
+                movie_titles.append(row["title"])
+                movie_years.append(row["year"])
+            else:
+                movie_titles[m] = row["title"]
+                movie_years[m] = row["year"]
+
+    # Load stars as two parallel index arrays
+    star_people = array(INDEX)
+    star_movies = array(INDEX)
+    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            try:
+                p = person_index[row["person_id"]]
+                m = movie_index[row["movie_id"]]
+            except KeyError:
+                continue
+            star_people.append(p)
+            star_movies.append(m)
+    # The dicts were only needed to read the stars
+    del person_index, movie_index
+
+    graph.person_offsets, graph.person_movies = build_csr(
+        star_people, star_movies, len(person_ids))
+    graph.movie_offsets, graph.movie_people = build_csr(
+        star_movies, star_people, len(movie_ids))
+
+    lower_names = [name.lower() for name in person_names]
+    graph.person_id_order = sorted_order(person_ids)
+    graph.movie_id_order = sorted_order(movie_ids)
+    graph.name_order = sorted_order(lower_names)
+    graph.sorted_names = string_table(lower_names[p] for p in graph.name_order)
+    graph.person_ids = string_table(person_ids)
+    graph.person_names = string_table(person_names)
+    graph.person_births = string_table(person_births)
+    graph.movie_ids = string_table(movie_ids)
+    graph.movie_titles = string_table(movie_titles)
+    graph.movie_years = string_table(movie_years)
+    return graph
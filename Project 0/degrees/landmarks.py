@@ -0,0 +1,275 @@
+"""
+Landmark based A* search (ALT) over a Graph.
+
+A few landmark people are picked and the hop distance from each of them to
+everyone is stored. By the triangle inequality |d(l, t) - d(l, p)| never
+exceeds d(p, t), so the largest such difference over all landmarks is a
+lower bound A* can use to head straight for the target while still finding
+a shortest path.
+
+The distances are saved next to the CSV files so they are only computed once.
+
+Usage: python landmarks.py [directory] [count]
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from heapq import heappop, heappush
+
+from graph import INDEX, load_graph
+from snapshot import SOURCES, fingerprint
+
+# Name of the index file inside the data directory
+LANDMARKS = "landmarks.index"
+
+# Bumped whenever the layout below changes, older files are rebuilt
+VERSION = 2
+
+MAGIC = b"LANDMARK"
+
+# Magic, version, byte order, landmark count, people count, count asked
+# for, method, then the stamp
+HEADER = struct.Struct("<8sIBIIIB" + "qq" * len(SOURCES))
+
+# Typecode of the stored distances, 2 byte signed ints, -1 if unreachable
+DISTANCE = "h"
+
+# Number of landmarks picked when none is given
+COUNT = 16
+
+# Ways of picking landmarks, see select_landmarks
+METHODS = ["degree", "farthest"]
+
+
+class LandmarkIndex():
+    """
+    Hop distances from each landmark to every person, distance[i * n + p]
+    being the distance from landmarks[i] to person index p. count and
+    method are what the landmarks were picked with, count may be more
+    than the landmarks found.
+    """
+
+    def __init__(self, landmarks, distances, n, count=COUNT, method="degree"):
+        self.landmarks = landmarks
+        self.distances = distances
+        self.n = n
+        self.count = count
+        self.method = method
+
+    def bound(self, target):
+        """
+        Returns a function giving a lower bound on the distance from a person
+        index to target, or None if the two can not be connected.
+        """
+        n = self.n
+        rows = [(i * n, self.distances[i * n + target])
+                for i in range(len(self.landmarks))]
+
+        def lower_bound(p):
+            best = 0
+            for start, to_target in rows:
+                to_p = self.distances[start + p]
+                if to_p < 0 and to_target < 0:
+                    continue
+                # Only one is reachable from the landmark, so not connected
+                if to_p < 0 or to_target < 0:
+                    return None
+                best = max(best, abs(to_target - to_p))
+            return best
+        return lower_bound
+
+
+def hop_distances(graph, source):
+    """
+    Returns an array of the hop distance from person index source to every
+    person index, -1 for people who can not be reached.
+    """
+    distance = array(DISTANCE, [-1]) * graph.num_people()
+    distance[source] = 0
+    frontier = [source]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for p in frontier:
+            for _, q in graph.neighbors(p):
+                if distance[q] == -1:
+                    distance[q] = depth
+                    next_frontier.append(q)
+        frontier = next_frontier
+    return distance
+
+
+def degree(graph, p):
+    """
+    Returns the number of credits shared with p, counted with repeats.
+    """
+    return sum(len(graph.stars_of(m)) - 1 for m in graph.movies_of(p))
+
+
+def select_landmarks(graph, count=COUNT, method="degree"):
+    """
+    Returns a list of count person indices and their hop distances.
+
+    "degree" picks the best connected people. "farthest" starts from the
+    best connected person and then repeatedly picks whoever is farthest
+    from all landmarks picked so far, which spreads them over the graph.
+    """
+    count = min(count, graph.num_people())
+    if method == "degree":
+        ranked = sorted(range(graph.num_people()),
+                        key=lambda p: degree(graph, p), reverse=True)
+        landmarks = ranked[:count]
+        return landmarks, [hop_distances(graph, p) for p in landmarks]
+
+    if method != "farthest":
+        raise ValueError(f"Unknown landmark method: {method}")
+    first = max(range(graph.num_people()), key=lambda p: degree(graph, p))
+    landmarks = [first]
+    distances = [hop_distances(graph, first)]
+    # Distance to the nearest landmark, -1 while no landmark reaches p
+    nearest = array(DISTANCE, distances[0])
+    while len(landmarks) < count:
+        farthest = max(range(graph.num_people()), key=nearest.__getitem__)
+        if nearest[farthest] <= 0:
+            break
+        landmarks.append(farthest)
+        distances.append(hop_distances(graph, farthest))
+        for p, d in enumerate(distances[-1]):
+            if d >= 0 and (nearest[p] < 0 or d < nearest[p]):
+                nearest[p] = d
+    return landmarks, distances
+
+
+def build_landmark_index(graph, count=COUNT, method="degree"):
+    landmarks, rows = select_landmarks(graph, count, method)
+    distances = array(DISTANCE)
+    for row in rows:
+        distances.extend(row)
+    return LandmarkIndex(landmarks, distances, graph.num_people(), count, method)
+
+
+def write_landmark_index(index, directory):
+    """
+    Saves index to the landmark file in directory, stamped with the
+    current fingerprint of the CSV files there.
+    """
+    path = os.path.join(directory, LANDMARKS)
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, sys.byteorder == "little",
+                            len(index.landmarks), index.n, index.count,
+                            METHODS.index(index.method), *fingerprint(directory)))
+        f.write(array(INDEX, index.landmarks))
+        f.write(bytes(-f.tell() % 8))
+        f.write(index.distances)
+    os.replace(temporary, path)
+    return path
+
+
+def read_landmark_index(directory, n, count=COUNT, method="degree"):
+    """
+    Memory maps the landmark file in directory, returns None if it is
+    missing, out of date, or not built for n people with count landmarks
+    picked by method.
+    """
+    try:
+        with open(os.path.join(directory, LANDMARKS), "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(buffer) < HEADER.size:
+        return None
+    (magic, version, little, found, people, asked, picked,
+     *stamp) = HEADER.unpack_from(buffer)
+    if (magic != MAGIC or version != VERSION
+            or little != (sys.byteorder == "little")
+            or people != n or asked != count or picked >= len(METHODS)
+            or METHODS[picked] != method or stamp != fingerprint(directory)):
+        return None
+
+    start = HEADER.size
+    end = start + found * array(INDEX).itemsize
+    landmarks = list(memoryview(buffer)[start:end].cast(INDEX))
+    start = end + (-end % 8)
+    distances = memoryview(buffer)[start:].cast(DISTANCE)
+    return LandmarkIndex(landmarks, distances, n, count, method)
+
+
+def load_landmark_index(graph, directory, count=COUNT, method="degree"):
+    """
+    Returns the saved LandmarkIndex of directory, building and saving it
+    first if it is missing, out of date or picked differently.
+    """
+    index = read_landmark_index(directory, graph.num_people(), count, method)
+    if index is not None:
+        return index
+    index = build_landmark_index(graph, count, method)
+    try:
+        write_landmark_index(index, directory)
+    except OSError:
+        pass
+    return index
+
+
+def alt_shortest_path(graph, index, source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs that connect
+    the source to the target, or None if there is none, using A* with the
+    landmark lower bounds of index as the heuristic.
+    """
+    s = graph.person_index_for_id(source)
+    t = graph.person_index_for_id(target)
+    if s == t:
+        return []
+    lower_bound = index.bound(t)
+    if lower_bound(s) is None:
+        return None
+
+    n = graph.num_people()
+    cost = array(INDEX, [-1]) * n
+    parent = array(INDEX, [-1]) * n
+    via = array(INDEX, [-1]) * n
+    closed = bytearray(n)
+    cost[s] = 0
+    parent[s] = s
+
+    # Entries are (estimated total, -cost, person), preferring deeper people on ties
+    heap = [(lower_bound(s), 0, s)]
+    while heap:
+        _, _, p = heappop(heap)
+        if closed[p]:
+            continue
+        if p == t:
+            return graph.path_from_parents(parent, via, t)
+        closed[p] = 1
+
+        for m, q in graph.neighbors(p):
+            if closed[q]:
+                continue
+            new_cost = cost[p] + 1
+            if cost[q] == -1 or new_cost < cost[q]:
+                estimate = lower_bound(q)
+                if estimate is None:
+                    continue
+                cost[q] = new_cost
+                parent[q] = p
+                via[q] = m
+                heappush(heap, (new_cost + estimate, -new_cost, q))
+    return None
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python landmarks.py [directory] [count]")
+    directory = sys.argv[1] if len(sys.argv) >= 2 else "large"
+    count = int(sys.argv[2]) if len(sys.argv) == 3 else COUNT
+    index = build_landmark_index(load_graph(directory), count)
+    print(f"Landmark index written to {write_landmark_index(index, directory)}.")
+
+
+if __name__ == "__main__":
+    main()
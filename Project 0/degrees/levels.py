@@ -0,0 +1,120 @@
+"""
+Level synchronous breadth first search over a Graph, for questions about
+everyone within some distance of a person rather than about one path.
+
+Each level is expanded with whole array operations: the visited people and
+the already walked movies are dense boolean arrays indexed by person and
+movie, and a frontier's movies and co-stars are gathered from the CSR
+arrays in one step.
+
+Usage: python levels.py directory name [max_depth] [--members K]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from snapshot import load_snapshot
+
+
+def csr_rows(offsets, columns, rows):
+    """
+    Returns the concatenated columns of every row in rows.
+    """
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    # Position of each output item within its row, then shift by the row start
+    ends = np.cumsum(lengths)
+    positions = np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - lengths, lengths)
+    return columns[positions + np.repeat(starts, lengths)]
+
+
+def bfs_levels(graph, source, max_depth=None):
+    """
+    Yields (depth, people) for every distance from person index source,
+    people being the array of person indices at exactly that distance.
+    Stops after max_depth, or once everyone reachable has been yielded.
+    """
+    # The arrays are read directly, so fold in any stars added since
+    graph.compact()
+    person_offsets = np.frombuffer(graph.person_offsets, dtype=np.int32)
+    person_movies = np.frombuffer(graph.person_movies, dtype=np.int32)
+    movie_offsets = np.frombuffer(graph.movie_offsets, dtype=np.int32)
+    movie_people = np.frombuffer(graph.movie_people, dtype=np.int32)
+
+    visited = np.zeros(graph.num_people(), dtype=bool)
+    walked = np.zeros(graph.num_movies(), dtype=bool)
+    frontier = np.array([source], dtype=np.int32)
+    visited[source] = True
+
+    depth = 0
+    while len(frontier):
+        yield depth, frontier
+        if depth == max_depth:
+            return
+
+        # Movies of the frontier no earlier level walked
+        movies = csr_rows(person_offsets, person_movies, frontier)
+        movies = np.unique(movies[~walked[movies]])
+        walked[movies] = True
+
+        # Their stars no earlier level reached
+        people = csr_rows(movie_offsets, movie_people, movies)
+        frontier = np.unique(people[~visited[people]])
+        visited[frontier] = True
+        depth += 1
+
+
+def level_counts(graph, source, max_depth=None):
+    """
+    Returns a list whose item d is the number of people at distance d.
+    """
+    return [len(people) for _, people in bfs_levels(graph, source, max_depth)]
+
+
+def within(graph, source, k):
+    """
+    Returns the number of people at most k steps from person index source,
+    counting the source.
+    """
+    return sum(level_counts(graph, source, k))
+
+
+def at_distance(graph, source, k):
+    """
+    Yields the ids of the people exactly k steps from person index source.
+    """
+    for depth, people in bfs_levels(graph, source, k):
+        if depth == k:
+            for p in people:
+                yield graph.person_ids[p]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Count the people within each distance of a person.")
+    parser.add_argument("directory")
+    parser.add_argument("name")
+    parser.add_argument("max_depth", nargs="?", type=int)
+    parser.add_argument("--members", type=int, metavar="K",
+                        help="also list everyone at exactly distance K")
+    args = parser.parse_args()
+
+    graph = load_snapshot(args.directory)
+    person_ids = graph.person_ids_for_name(args.name)
+    if len(person_ids) != 1:
+        sys.exit("Person not found." if not person_ids else "Ambiguous name.")
+    source = graph.person_index_for_id(person_ids[0])
+
+    total = 0
+    for depth, count in enumerate(level_counts(graph, source, args.max_depth)):
+        total += count
+        print(f"{depth}: {count} people, {total} within {depth} degrees")
+    if args.members is not None:
+        for person_id in at_distance(graph, source, args.members):
+            print(f"{person_id}\t{graph.person_for_id(person_id)['name']}")
+
+
+if __name__ == "__main__":
+    main()
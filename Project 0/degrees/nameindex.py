@@ -0,0 +1,138 @@
+"""
+Index of lowercase names for prefix and typo tolerant lookups.
+
+Prefix queries binary search a sorted list of the names. Fuzzy queries use
+an inverted index from character trigrams to the names containing them.
+The postings of the rarest trigrams of the query are counted with NumPy,
+up to a fixed number of them, and only the candidates sharing the most of
+those trigrams are looked up in the postings of the others, so a query
+costs about the same however many names there are.
+"""
+
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+from graph import INDEX
+
+# Marks the start and end of a name, so trigrams also capture its ends
+PAD = "$"
+
+# Share of the query trigrams a fuzzy match must contain
+MIN_OVERLAP = 0.5
+
+# Most postings counted for the candidates of a fuzzy query
+MAX_SCAN = 100000
+
+# Most candidates of a fuzzy query looked up in its other postings
+MAX_CANDIDATES = 500
+
+
+def trigrams(name):
+    """
+    Returns the set of three character substrings of a padded name.
+    """
+    padded = f"{PAD}{name}{PAD}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex():
+    """
+    Distinct lowercase names, numbered in the order they were added, with
+    a sorted copy for prefix queries and, for each trigram, the ascending
+    array of numbers of the names containing it.
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self.sorted_names = []
+        self.postings = {}
+        # Number of distinct trigrams of each name
+        self.sizes = array("H")
+        for name in sorted(set(names)):
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name):
+        """
+        Adds a lowercase name, if not already in the index.
+        """
+        i = bisect_left(self.sorted_names, name)
+        if i < len(self.sorted_names) and self.sorted_names[i] == name:
+            return
+        self.sorted_names.insert(i, name)
+
+        # New numbers are the largest so far, so appending keeps order
+        number = len(self.names)
+        self.names.append(name)
+        grams = trigrams(name)
+        self.sizes.append(len(grams))
+        for gram in grams:
+            if gram not in self.postings:
+                self.postings[gram] = array(INDEX)
+            self.postings[gram].append(number)
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to limit names starting with prefix, in sorted order.
+        """
+        prefix = prefix.lower()
+        names = self.sorted_names
+        matches = []
+        i = bisect_left(names, prefix)
+        while i < len(names) and len(matches) < limit and names[i].startswith(prefix):
+            matches.append(names[i])
+            i += 1
+        return matches
+
+    def fuzzy(self, query, limit=10):
+        """
+        Returns up to limit names most similar to query, best first.
+
+        Similarity is the Jaccard index of the two sets of trigrams. Only
+        names sharing at least MIN_OVERLAP of the query trigrams are found.
+        When even the rarest trigrams of the query are common, only the
+        best MAX_CANDIDATES candidates are ranked, so a match may be missed.
+        """
+        grams = trigrams(query.lower())
+        lists = sorted((np.frombuffer(self.postings[gram], dtype=INDEX)
+                        for gram in grams if gram in self.postings), key=len)
+        needed = max(1, int(len(grams) * MIN_OVERLAP))
+        if len(lists) < needed:
+            return []
+
+        # A name missing from all of the rarest len - needed + 1 lists can
+        # not share needed trigrams, so those lists hold every candidate.
+        # Count fewer of them if that would go over MAX_SCAN postings
+        split = len(lists) - needed + 1
+        total = 0
+        for count, postings in enumerate(lists[:split]):
+            if count and total + len(postings) > MAX_SCAN:
+                split = count
+                break
+            total += len(postings)
+        candidates, shared = np.unique(
+            np.concatenate(lists[:split])[:MAX_SCAN], return_counts=True)
+        rest = lists[split:]
+        keep = shared + len(rest) >= needed
+        candidates, shared = candidates[keep], shared[keep]
+
+        # Look the most promising candidates up in the other lists
+        if len(candidates) > MAX_CANDIDATES:
+            best = np.sort(np.argpartition(-shared, MAX_CANDIDATES)[:MAX_CANDIDATES])
+            candidates, shared = candidates[best], shared[best]
+        for postings in rest:
+            found = np.searchsorted(postings, candidates)
+            shared += postings[np.minimum(found, len(postings) - 1)] == candidates
+
+        keep = shared >= needed
+        candidates, shared = candidates[keep], shared[keep]
+        sizes = np.frombuffer(self.sizes, dtype=self.sizes.typecode)[candidates]
+        scores = shared / (len(grams) + sizes - shared)
+        # Best score first, ties in the order the names were added
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [self.names[i] for i in candidates[order]]
+
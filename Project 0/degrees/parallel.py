@@ -0,0 +1,173 @@
+"""
+Breadth first search over a Graph split across processes, for very large
+graphs where a single core takes seconds to search between distant people.
+
+The CSR arrays are copied once into shared memory that every worker maps.
+The search runs one level at a time: the frontier is cut into contiguous
+chunks that the workers expand against a shared bitmap of the people
+already visited, and the main process merges what they found, in chunk
+order, into the bitmap and the next frontier. Merging in order makes the
+first discovery of each person the same as in Graph.shortest_path, so the
+paths found are identical to the serial search.
+"""
+
+import atexit
+import multiprocessing
+from array import array
+from multiprocessing import shared_memory
+
+from graph import INDEX
+
+# Names of the shared arrays, in the order they are created
+ARRAYS = ["person_offsets", "person_movies", "movie_offsets", "movie_people"]
+
+# Frontiers smaller than this many people per worker are expanded in the
+# main process, as sending them to the workers would cost more
+MIN_CHUNK = 2000
+
+# Memoryviews of the shared arrays and bitmap, in a worker process
+views = {}
+
+
+def map_blocks(blocks):
+    """
+    Returns memoryviews of the shared arrays and bitmap in blocks, a dict
+    of array name to SharedMemory.
+    """
+    return {name: block.buf if name == "visited" else block.buf.cast(INDEX)
+            for name, block in blocks.items()}
+
+
+def attach(blocks):
+    """
+    Maps the shared memory blocks, a dict of array name to block name,
+    into views. Run by each worker as it starts.
+    """
+    # Keep the blocks referenced for as long as their views are in use
+    views["blocks"] = {name: shared_memory.SharedMemory(block)
+                       for name, block in blocks.items()}
+    views.update(map_blocks(views["blocks"]))
+
+
+def expand(frontier, mapped=None):
+    """
+    Returns the (person, parent, movie) index triples of the people not yet
+    visited who starred with someone in frontier, as one flat array, each
+    person once with the first parent and movie that reached them. Reads
+    the arrays from mapped, by default the views of this worker.
+    """
+    if mapped is None:
+        mapped = views
+    person_offsets = mapped["person_offsets"]
+    person_movies = mapped["person_movies"]
+    movie_offsets = mapped["movie_offsets"]
+    movie_people = mapped["movie_people"]
+    visited = mapped["visited"]
+
+    found = array(INDEX)
+    seen = set()
+    for p in frontier:
+        for m in person_movies[person_offsets[p]:person_offsets[p + 1]]:
+            for q in movie_people[movie_offsets[m]:movie_offsets[m + 1]]:
+                if not visited[q >> 3] & (1 << (q & 7)) and q not in seen:
+                    seen.add(q)
+                    found.extend((q, p, m))
+    return found
+
+
+class ParallelBFS():
+    """
+    Shortest path searches over graph run by a pool of worker processes.
+    The arrays are copied when it is created, so a new one is needed after
+    adding to the graph. Call close when done to free the shared memory.
+    """
+
+    def __init__(self, graph, workers=None):
+        graph.compact()
+        self.graph = graph
+        self.workers = workers or multiprocessing.cpu_count()
+
+        self.blocks = {}
+        for name in ARRAYS:
+            data = getattr(graph, name)
+            block = shared_memory.SharedMemory(
+                create=True, size=max(1, len(data) * data.itemsize))
+            block.buf[:len(data) * data.itemsize] = data.tobytes()
+            self.blocks[name] = block
+        # One bit per person
+        self.blocks["visited"] = shared_memory.SharedMemory(
+            create=True, size=max(1, (graph.num_people() + 7) // 8))
+
+        self.views = map_blocks(self.blocks)
+        names = {name: block.name for name, block in self.blocks.items()}
+        self.pool = multiprocessing.Pool(
+            self.workers, initializer=attach, initargs=(names,))
+        atexit.register(self.close)
+
+    def close(self):
+        if self.pool is None:
+            return
+        self.pool.terminate()
+        self.pool = None
+        # The blocks can only be closed once nothing views them
+        for view in self.views.values():
+            view.release()
+        self.views = {}
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def expand_level(self, frontier):
+        """
+        Expands frontier, split across the workers if it is big enough,
+        and returns the found triples of every chunk in frontier order.
+        """
+        chunks = min(self.workers, len(frontier) // MIN_CHUNK)
+        if chunks <= 1:
+            return [expand(frontier, self.views)]
+        size = -(-len(frontier) // chunks)
+        return self.pool.map(
+            expand, [frontier[i:i + size] for i in range(0, len(frontier), size)])
+
+    def shortest_path(self, source, target):
+        """
+        Returns the same as Graph.shortest_path.
+        """
+        graph = self.graph
+        s = graph.person_index_for_id(source)
+        t = graph.person_index_for_id(target)
+        if s == t:
+            return []
+
+        visited = self.views["visited"]
+        visited[:] = bytes(len(visited))
+        parent = array(INDEX, [-1]) * graph.num_people()
+        via = array(INDEX, [-1]) * graph.num_people()
+        parent[s] = s
+        visited[s >> 3] |= 1 << (s & 7)
+
+        frontier = array(INDEX, [s])
+        while frontier:
+            next_frontier = array(INDEX)
+            for found in self.expand_level(frontier):
+                for i in range(0, len(found), 3):
+                    q = found[i]
+                    # Found by an earlier chunk too, which the serial search
+                    # would have expanded first
+                    if parent[q] != -1:
+                        continue
+                    parent[q] = found[i + 1]
+                    via[q] = found[i + 2]
+                    visited[q >> 3] |= 1 << (q & 7)
+                    next_frontier.append(q)
+            if parent[t] != -1:
+                return graph.path_from_parents(parent, via, t)
+            frontier = next_frontier
+        return None
@@ -0,0 +1,80 @@
+"""
+Every shortest path between two people, rather than the one a search
+happens to find.
+
+A breadth first search from the source records, for each person it
+reaches, all the (movie, person) pairs one level closer that reach them,
+and the number of shortest paths from the source to them, the sum of the
+numbers of their predecessors. Paths taking different movies between the
+same two people count as different paths.
+"""
+
+
+def path_dag(source, target, neighbors):
+    """
+    Returns (parents, counts) for the layers of a breadth first search from
+    source, up to and including the layer of target. parents maps each
+    reached person to the list of (movie, person) pairs from the previous
+    layer that reach them, counts maps them to their number of shortest
+    paths from source. target is missing from both if not reachable.
+
+    neighbors is a function returning the (movie, person) pairs of a person.
+    """
+    parents = {source: []}
+    counts = {source: 1}
+    frontier = [source]
+    while frontier and target not in counts:
+        layer = {}
+        for person in frontier:
+            for movie, neighbor in neighbors(person):
+                if neighbor in counts:
+                    continue
+                if neighbor not in layer:
+                    layer[neighbor] = []
+                layer[neighbor].append((movie, person))
+        for person, via in layer.items():
+            parents[person] = via
+            counts[person] = sum(counts[parent] for _, parent in via)
+        frontier = list(layer)
+    return parents, counts
+
+
+def count_shortest_paths(source, target, neighbors):
+    """
+    Returns the number of shortest paths from source to target.
+    """
+    _, counts = path_dag(source, target, neighbors)
+    return counts.get(target, 0)
+
+
+def all_shortest_paths(source, target, neighbors, dag=None):
+    """
+    Yields every shortest list of (movie, person) pairs from source to
+    target, one at a time, so only the path being built is in memory
+    besides the search layers. Yields nothing if they are not connected.
+
+    dag is the (parents, counts) of path_dag, if the caller already built
+    it, to save searching again.
+    """
+    if dag is None:
+        dag = path_dag(source, target, neighbors)
+    parents, _ = dag
+    if target not in parents:
+        return
+
+    # Depth first walk back from target, path holds the (movie, person) pairs
+    # taken so far and stack the next parent to try at each of them
+    path = [(None, target)]
+    stack = [0]
+    while stack:
+        _, person = path[-1]
+        if person == source:
+            yield [(path[i][0], path[i - 1][1]) for i in range(len(path) - 1, 0, -1)]
+        i = stack[-1]
+        if person != source and i < len(parents[person]):
+            stack[-1] += 1
+            path.append(parents[person][i])
+            stack.append(0)
+        else:
+            path.pop()
+            stack.pop()
@@ -0,0 +1,309 @@
+"""
+Long running server answering degrees queries over TCP, so the data is
+loaded once rather than by every request.
+
+Each request is one line of JSON and gets one line of JSON back:
+
+    {"id": 1, "source": "Emma Watson", "target": "Tom Hanks", "search": "bfs"}
+    {"id": 1, "source": "Emma Watson", "target": "Tom Hanks", "degrees": 3, "path": [...]}
+
+"search" is optional and "id" is echoed back, as requests sent on the same
+connection are answered concurrently and may come back in any order.
+{"op": "stats"} returns the request and latency counters instead.
+
+A search that runs past the timeout can not be interrupted inside its
+worker, so the workers are killed and replaced, and the requests they
+were still answering are sent again to the new ones.
+
+Usage: python server.py directory [--storage ...] [--ingest DIR ...]
+       [--port PORT] [--workers N] [--timeout SECONDS]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import degrees
+from benchmark import percentiles
+
+# Default port, and seconds a search may take before its request fails
+PORT = 8765
+TIMEOUT = 10
+
+# Number of recent latencies the percentiles in the stats are taken over
+RECENT = 10000
+
+# Searches the server does not run, "parallel" would start a pool of its
+# own inside every worker
+EXCLUDED = {"parallel"}
+
+
+class QueryServer():
+    """
+    Answers requests with degrees.answer_query in a pool of worker
+    processes, so searches run in parallel and never block the event loop.
+    The data must be loaded with degrees.load_data before the first request.
+    """
+
+    def __init__(self, workers=None, timeout=TIMEOUT, directory=None,
+                 storage="dict", ingests=()):
+        self.workers = workers
+        self.directory = directory
+        self.storage = storage
+        self.ingests = list(ingests)
+        self.timeout = timeout
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.active = 0
+        self.latencies = deque(maxlen=RECENT)
+        self.connections = set()
+        self.sockets = set()
+        self.pool = self.start_pool()
+
+    def start_pool(self):
+        """
+        Returns a new pool of worker processes. Forked workers share the
+        loaded data, others load it and ingest the same directories.
+        """
+        if "fork" in multiprocessing.get_all_start_methods():
+            return ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("fork"),
+                initializer=self.close_sockets)
+        return ProcessPoolExecutor(
+            self.workers, initializer=degrees.load_worker,
+            initargs=(self.directory, self.storage, self.ingests))
+
+    def close_sockets(self):
+        """
+        Closes the sockets a forked worker inherited from the server, so
+        connections end when the server closes them. Workers may be forked
+        while clients are connected, when first used or after a restart.
+        """
+        for sock in self.sockets:
+            # -1 once the server has closed it
+            if sock.fileno() >= 0:
+                os.close(sock.fileno())
+
+    def restart(self, pool):
+        """
+        Kills the workers of pool, which may be stuck in a search, and
+        replaces it with a new pool unless that was already done.
+        """
+        if pool is not self.pool:
+            return
+        self.restarts += 1
+        self.pool = self.start_pool()
+        # ProcessPoolExecutor only has a public way to do this from 3.14
+        for process in list(pool._processes.values()):
+            process.terminate()
+        pool.shutdown(wait=False)
+
+    async def start(self, host="127.0.0.1", port=PORT):
+        """
+        Starts listening, returns the asyncio.Server.
+        """
+        listener = await asyncio.start_server(self.handle, host, port)
+        self.sockets.update(listener.sockets)
+        return listener
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    async def wait_closed(self):
+        """
+        Waits until every client has disconnected.
+        """
+        await asyncio.gather(*self.connections)
+
+    async def handle(self, reader, writer):
+        """
+        Answers the requests of one connection until the client closes it.
+        """
+        self.connections.add(asyncio.current_task())
+        sock = writer.get_extra_info("socket")
+        self.sockets.add(sock)
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self.reply(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+            self.sockets.discard(sock)
+            self.connections.discard(asyncio.current_task())
+
+    async def reply(self, line, writer):
+        """
+        Writes the response to one request line. Every line gets exactly
+        one answer, an error if answering it failed unexpectedly.
+        """
+        try:
+            response = await self.respond(line)
+        except Exception as e:
+            response = {"error": f"Internal error: {e}."}
+        writer.write(json.dumps(response).encode() + b"\n")
+        await writer.drain()
+
+    async def respond(self, line):
+        """
+        Returns the response to one request line.
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {"error": "Invalid JSON."}
+        if not isinstance(request, dict):
+            return {"error": "Expected a JSON object."}
+        if request.get("op") == "stats":
+            return {"id": request.get("id"), "stats": self.statistics()}
+
+        search = request.get("search", "bfs")
+        if (not isinstance(search, str) or search not in degrees.SEARCHES
+                or search in EXCLUDED):
+            return {"id": request.get("id"), "error": f"Unknown search: {search}."}
+        if not all(isinstance(request.get(key), str) for key in ("source", "target")):
+            return {"id": request.get("id"), "error": "Expected source and target names."}
+
+        start = time.perf_counter()
+        self.requests += 1
+        self.active += 1
+        row = [request.get("source"), request.get("target")]
+        try:
+            result = await self.run(row, search)
+        except Exception as e:
+            result = {"source": row[0], "target": row[1], "error": str(e)}
+        finally:
+            self.active -= 1
+        if "error" in result:
+            self.errors += 1
+        self.latencies.append(time.perf_counter() - start)
+        return {"id": request.get("id"), **result}
+
+    async def run(self, row, search):
+        """
+        Returns degrees.answer_query of row and search from a worker, or a
+        timed out error, restarting the workers, if it takes too long.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            pool = self.pool
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(
+                        pool, degrees.answer_query, (row, search)),
+                    self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.restart(pool)
+                return {"source": row[0], "target": row[1], "error": "Timed out."}
+            except BrokenProcessPool:
+                # Killed for another request's timeout, start again on the
+                # new workers with the full timeout
+                if pool is self.pool:
+                    raise
+
+    def statistics(self):
+        """
+        Returns the request counters and latency percentiles so far.
+        """
+        return {
+            "uptime": time.monotonic() - self.started,
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+            "active": self.active,
+            "latency_ms": percentiles(list(self.latencies)),
+        }
+
+
+class Client():
+    """
+    Minimal client of a QueryServer, sending one request at a time.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 0
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=PORT):
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def request(self, message):
+        """
+        Sends a request dictionary, returns the response dictionary.
+        """
+        self.next_id += 1
+        self.writer.write(json.dumps({"id": self.next_id, **message}).encode() + b"\n")
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+    async def shortest_path(self, source, target, search="bfs"):
+        return await self.request(
+            {"source": source, "target": target, "search": search})
+
+    async def stats(self):
+        return (await self.request({"op": "stats"}))["stats"]
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def serve(host, port, workers, timeout, directory, storage, ingests=()):
+    server = QueryServer(workers, timeout, directory, storage, ingests)
+    listener = await server.start(host, port)
+    print(f"Listening on {host}:{port}.")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer degrees queries sent as JSON lines over TCP.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--storage", choices=degrees.STORAGES, default="dict")
+    parser.add_argument("--ingest", action="append", default=[], metavar="DIR",
+                        help="add the people, movies and stars in DIR after loading")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int,
+                        help="processes running searches, defaults to one per core")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT,
+                        help="seconds before a request fails")
+    parser.add_argument("--landmarks", type=int, default=16,
+                        help="number of landmarks for the alt search")
+    args = parser.parse_args()
+
+    print("Loading data...")
+    degrees.load_data(args.directory, args.storage)
+    for directory in args.ingest:
+        degrees.ingest(directory)
+    if isinstance(degrees.store, degrees.Graph):
+        degrees.load_landmarks(args.directory, args.landmarks)
+    print("Data loaded.")
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.timeout,
+                          args.directory, args.storage, args.ingest))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
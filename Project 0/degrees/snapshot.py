@@ -0,0 +1,209 @@
+"""
+Binary snapshot of a Graph, written next to the CSV files it was built from.
+
+Building a Graph means parsing every CSV file, which takes a long time on the
+large directory. A snapshot stores the same arrays, plus the strings and
+sorted indices needed for lookups, in one file that later runs memory map,
+so nothing is parsed or copied until a query touches it.
+
+Usage: python snapshot.py [directory]
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from components import graph_components
+from graph import Graph, INDEX, OFFSET, StringTable, load_graph
+
+# Name of the snapshot file inside the data directory
+SNAPSHOT = "degrees.snapshot"
+
+# Bumped whenever the layout below changes, older snapshots are rebuilt
+VERSION = 2
+
+MAGIC = b"DEGREES\0"
+
+# CSV files whose mtime and size decide if a snapshot is stale
+SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+
+# Magic, version, byte order, section count, then mtime and size per source
+HEADER = struct.Struct("<8sIBI" + "qq" * len(SOURCES))
+
+# Name, typecode, offset and length in items of each section
+SECTION = struct.Struct("<32scqq")
+
+
+class MappedGraph(Graph):
+    """
+    Graph whose arrays are views into a memory mapped snapshot file,
+    including the sorted orders ids and names are looked up by.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        sections = read_sections(self.mmap)
+        if sections is None:
+            raise ValueError(f"{path} is not a degrees snapshot")
+
+        for name in ["person_offsets", "person_movies",
+                     "movie_offsets", "movie_people",
+                     "person_id_order", "movie_id_order", "name_order",
+                     "component_parent", "component_size"]:
+            setattr(self, name, sections[name])
+        for name in ["person_ids", "person_names", "person_births",
+                     "movie_ids", "movie_titles", "movie_years", "sorted_names"]:
+            setattr(self, name, StringTable(
+                sections[f"{name}.off"], sections[f"{name}.str"]))
+
+
+def fingerprint(directory):
+    """
+    Returns the mtime and size of every source CSV as a flat list.
+    """
+    values = []
+    for source in SOURCES:
+        stat = os.stat(os.path.join(directory, source))
+        values.extend([stat.st_mtime_ns, stat.st_size])
+    return values
+
+
+def read_sections(buffer):
+    """
+    Parses the header of a snapshot in buffer, returns a dict of section
+    name -> memoryview, or None if the header is not valid for this machine.
+    """
+    if len(buffer) < HEADER.size:
+        return None
+    magic, version, little, count, *_ = HEADER.unpack_from(buffer)
+    if (magic != MAGIC or version != VERSION
+            or little != (sys.byteorder == "little")):
+        return None
+
+    view = memoryview(buffer)
+    sections = {}
+    for i in range(count):
+        name, typecode, offset, length = SECTION.unpack_from(
+            buffer, HEADER.size + i * SECTION.size)
+        typecode = typecode.decode()
+        size = array(typecode).itemsize
+        section = view[offset:offset + length * size]
+        sections[name.rstrip(b"\0").decode()] = section.cast(typecode)
+    return sections
+
+
+def string_sections(name, strings):
+    """
+    Returns the (name, array) pairs storing strings as a StringTable.
+    """
+    offsets = array(OFFSET, [0])
+    data = bytearray()
+    for string in strings:
+        data += string.encode("utf-8")
+        offsets.append(len(data))
+    return [(f"{name}.off", offsets), (f"{name}.str", array("B", data))]
+
+
+def write_snapshot(graph, directory):
+    """
+    Writes graph to the snapshot file in directory, stamped with the
+    current fingerprint of the CSV files there.
+    """
+    person_ids = list(graph.person_ids)
+    movie_ids = list(graph.movie_ids)
+    lower_names = [name.lower() for name in graph.person_names]
+    name_order = sorted(range(len(lower_names)), key=lower_names.__getitem__)
+    components = graph_components(graph)
+
+    sections = [
+        ("person_offsets", graph.person_offsets),
+        ("person_movies", graph.person_movies),
+        ("movie_offsets", graph.movie_offsets),
+        ("movie_people", graph.movie_people),
+        ("person_id_order", array(INDEX, sorted(
+            range(len(person_ids)), key=person_ids.__getitem__))),
+        ("movie_id_order", array(INDEX, sorted(
+            range(len(movie_ids)), key=movie_ids.__getitem__))),
+        ("name_order", array(INDEX, name_order)),
+        ("component_parent", components.parent),
+        ("component_size", components.size),
+    ]
+    sections += string_sections("person_ids", person_ids)
+    sections += string_sections("person_names", graph.person_names)
+    sections += string_sections("person_births", graph.person_births)
+    sections += string_sections("movie_ids", movie_ids)
+    sections += string_sections("movie_titles", graph.movie_titles)
+    sections += string_sections("movie_years", graph.movie_years)
+    sections += string_sections(
+        "sorted_names", [lower_names[p] for p in name_order])
+
+    # Lay out every section after the header, each aligned to 8 bytes
+    offset = HEADER.size + SECTION.size * len(sections)
+    table = []
+    for name, values in sections:
+        offset += -offset % 8
+        table.append(SECTION.pack(
+            name.encode(), values.typecode.encode(), offset, len(values)))
+        offset += len(values) * values.itemsize
+
+    # Write to a temporary file first so readers never see half a snapshot
+    path = os.path.join(directory, SNAPSHOT)
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, sys.byteorder == "little",
+                            len(sections), *fingerprint(directory)))
+        for entry in table:
+            f.write(entry)
+        for _, values in sections:
+            f.write(bytes(-f.tell() % 8))
+            f.write(values)
+    os.replace(temporary, path)
+    return path
+
+
+def snapshot_is_current(directory):
+    """
+    Returns True if directory holds a snapshot matching its CSV files.
+    """
+    try:
+        with open(os.path.join(directory, SNAPSHOT), "rb") as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return False
+    if len(header) < HEADER.size:
+        return False
+    magic, version, little, _, *stamp = HEADER.unpack(header)
+    return (magic == MAGIC and version == VERSION
+            and little == (sys.byteorder == "little")
+            and stamp == fingerprint(directory))
+
+
+def load_snapshot(directory):
+    """
+    Returns a MappedGraph of the snapshot in directory, compiling the
+    snapshot from the CSV files first if it is missing or out of date.
+    """
+    if not snapshot_is_current(directory):
+        graph = load_graph(directory)
+        try:
+            write_snapshot(graph, directory)
+        except OSError:
+            # Read only directory, keep the graph that was just built
+            return graph
+    return MappedGraph(os.path.join(directory, SNAPSHOT))
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python snapshot.py [directory]")
+    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    path = write_snapshot(load_graph(directory), directory)
+    print(f"Snapshot written to {path}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+SQLite storage for datasets too big to hold in memory.
+
+The CSV files are imported once into a database next to them, and people,
+movies and co-stars are then fetched with indexed queries as the searches
+need them. Only a bounded cache of recently expanded people stays in memory.
+Unlike the other storages the database keeps what is ingested into it, until
+the CSV files it was imported or ingested from change.
+"""
+
+import csv
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+
+from components import ComponentIndex
+from snapshot import SOURCES, fingerprint
+
+# Name of the database file inside the data directory
+DATABASE = "degrees.sqlite"
+
+# Bumped whenever the schema below changes, older databases are rebuilt
+VERSION = 3
+
+# Default number of people whose neighbors are kept in memory
+CACHE_SIZE = 10000
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE people (id TEXT PRIMARY KEY, name TEXT, lower_name TEXT, birth TEXT);
+CREATE TABLE movies (id TEXT PRIMARY KEY, title TEXT, year TEXT);
+CREATE TABLE stars (person_id TEXT, movie_id TEXT, UNIQUE (person_id, movie_id));
+CREATE TABLE components (person_id TEXT PRIMARY KEY, root TEXT);
+CREATE TABLE roots (root TEXT PRIMARY KEY, size INTEGER);
+"""
+
+INDEXES = """
+CREATE INDEX people_lower_name ON people (lower_name);
+CREATE INDEX stars_person_id ON stars (person_id);
+CREATE INDEX stars_movie_id ON stars (movie_id);
+CREATE INDEX components_root ON components (root);
+"""
+
+
+class SQLiteStore():
+    """
+    Offers the same lookups as a Graph, keyed by IMDb id, answered by
+    queries against the database at path.
+    """
+
+    def __init__(self, path, cache_size=CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.connection = None
+        self.pid = None
+        self.changed = False
+
+    def query(self, sql, parameters=()):
+        """
+        Returns a cursor over the results of sql. Connects on first use in
+        each process, as connections can not be shared with forked children.
+        """
+        if self.pid != os.getpid():
+            self.connection = sqlite3.connect(
+                f"file:{self.path}?mode=rw", uri=True, check_same_thread=False)
+            self.pid = os.getpid()
+        return self.connection.execute(sql, parameters)
+
+    def commit(self, directory):
+        """
+        Saves the changes made by add_person, add_movie and add_star while
+        ingesting directory. If there were any, directory and the mtime and
+        size of its files are recorded, so the database stays current, and
+        keeps the ingested rows, until the CSV files of either change.
+        """
+        if self.connection is None:
+            return
+        if self.changed:
+            directory = os.path.abspath(directory)
+            (value,), = self.query("SELECT value FROM meta WHERE key = 'ingests'")
+            ingests = [entry for entry in json.loads(value) if entry[0] != directory]
+            ingests.append([directory, delta_fingerprint(directory)])
+            self.query("UPDATE meta SET value = ? WHERE key = 'ingests'",
+                       (json.dumps(ingests),))
+            self.changed = False
+        self.connection.commit()
+
+    @property
+    def person_ids(self):
+        return [row[0] for row in self.query("SELECT id FROM people")]
+
+    def person_ids_for_name(self, name):
+        return [row[0] for row in self.query(
+            "SELECT id FROM people WHERE lower_name = ?", (name.lower(),))]
+
+    def lower_names(self):
+        return [row[0] for row in self.query(
+            "SELECT DISTINCT lower_name FROM people")]
+
+    def person_for_id(self, person_id):
+        name, birth = self.query(
+            "SELECT name, birth FROM people WHERE id = ?", (person_id,)).fetchone()
+        return {"name": name, "birth": birth}
+
+    def movie_for_id(self, movie_id):
+        title, year = self.query(
+            "SELECT title, year FROM movies WHERE id = ?", (movie_id,)).fetchone()
+        return {"title": title, "year": year}
+
+    def movies_for_person(self, person_id):
+        return [row[0] for row in self.query(
+            "SELECT movie_id FROM stars WHERE person_id = ?", (person_id,))]
+
+    def stars_for_movie(self, movie_id):
+        return [row[0] for row in self.query(
+            "SELECT person_id FROM stars WHERE movie_id = ?", (movie_id,))]
+
+    def neighbors_for_person(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        if person_id in self.cache:
+            self.cache.move_to_end(person_id)
+            return self.cache[person_id]
+
+        neighbors = set(self.query(
+            "SELECT b.movie_id, b.person_id FROM stars AS a "
+            "JOIN stars AS b ON a.movie_id = b.movie_id WHERE a.person_id = ?",
+            (person_id,)))
+        self.cache[person_id] = neighbors
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return neighbors
+
+    def add_person(self, person_id, name, birth):
+        """
+        Adds a new person, returns False if the id is already taken.
+        """
+        added = self.query(
+            "INSERT OR IGNORE INTO people VALUES (?, ?, ?, ?)",
+            (person_id, name, name.lower(), birth)).rowcount == 1
+        self.changed = self.changed or added
+        return added
+
+    def add_movie(self, movie_id, title, year):
+        """
+        Adds a new movie, returns False if the id is already taken.
+        """
+        added = self.query(
+            "INSERT OR IGNORE INTO movies VALUES (?, ?, ?)",
+            (movie_id, title, year)).rowcount == 1
+        self.changed = self.changed or added
+        return added
+
+    def add_star(self, person_id, movie_id):
+        """
+        Records that a person starred in a movie, returns False if either
+        is unknown or the star is already recorded. Forgets the cached
+        neighbors of everyone in the movie, as they all gained a co-star.
+        """
+        known = self.query(
+            "SELECT (SELECT COUNT(*) FROM people WHERE id = ?), "
+            "(SELECT COUNT(*) FROM movies WHERE id = ?)",
+            (person_id, movie_id)).fetchone()
+        if 0 in known:
+            return False
+        if self.query("INSERT OR IGNORE INTO stars VALUES (?, ?)",
+                      (person_id, movie_id)).rowcount == 0:
+            return False
+        self.changed = True
+        self.forget(self.stars_for_movie(movie_id))
+        return True
+
+    def forget(self, person_ids):
+        """
+        Drops the cached neighbors of person_ids.
+        """
+        for person_id in person_ids:
+            self.cache.pop(person_id, None)
+
+    def components(self):
+        return SQLiteComponents(self)
+
+
+class SQLiteComponents():
+    """
+    Offers the lookups of a ComponentIndex from the components table,
+    which stores the root of every person, and the roots table, which
+    stores the size of each component once, under its root.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def root(self, person_id):
+        """
+        Returns (root, size) of the component of person_id.
+        """
+        return self.store.query(
+            "SELECT roots.root, roots.size FROM components "
+            "JOIN roots ON roots.root = components.root "
+            "WHERE components.person_id = ?", (person_id,)).fetchone()
+
+    def connected(self, source, target):
+        return self.root(source)[0] == self.root(target)[0]
+
+    def add(self, person_id):
+        """
+        Adds a new person in a component of their own.
+        """
+        if self.store.query("INSERT OR IGNORE INTO components VALUES (?, ?)",
+                            (person_id, person_id)).rowcount == 1:
+            self.store.query("INSERT INTO roots VALUES (?, 1)", (person_id,))
+
+    def join(self, source, target):
+        """
+        Merges the components of the two person ids, relabelling the
+        people of the smaller one, so joining a component of n people
+        rewrites at most n rows.
+        """
+        root, size = self.root(source)
+        other, other_size = self.root(target)
+        if root == other:
+            return
+        if size < other_size:
+            root, other = other, root
+        self.store.query("UPDATE components SET root = ? WHERE root = ?",
+                         (root, other))
+        self.store.query("DELETE FROM roots WHERE root = ?", (other,))
+        self.store.query("UPDATE roots SET size = ? WHERE root = ?",
+                         (size + other_size, root))
+
+    def component_size(self, person_id):
+        return self.root(person_id)[1]
+
+    def statistics(self):
+        sizes = dict(self.store.query(
+            "SELECT size, COUNT(*) FROM roots GROUP BY size ORDER BY size DESC"))
+        return {
+            "people": sum(size * count for size, count in sizes.items()),
+            "components": sum(sizes.values()),
+            "largest": max(sizes, default=0),
+            "isolated": sizes.get(1, 0),
+            "sizes": sizes,
+        }
+
+
+def delta_fingerprint(directory):
+    """
+    Returns the mtime and size of every CSV file in an ingested directory,
+    None for the files it does not have.
+    """
+    values = []
+    for source in SOURCES:
+        path = os.path.join(directory, source)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            values.append([stat.st_mtime_ns, stat.st_size])
+        else:
+            values.append(None)
+    return values
+
+
+def database_is_current(path, directory):
+    """
+    Returns True if the database at path was imported from the CSV files
+    now in directory, and every directory ingested into it since is
+    unchanged.
+    """
+    if not os.path.exists(path):
+        return False
+    try:
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            meta = dict(connection.execute("SELECT key, value FROM meta"))
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return False
+    if json.loads(meta.get("stamp", "null")) != [VERSION] + fingerprint(directory):
+        return False
+    return all(delta_fingerprint(ingested) == values
+               for ingested, values in json.loads(meta["ingests"]))
+
+
+def import_csvs(directory, path):
+    """
+    Creates the database at path from the CSV files in directory.
+    """
+    temporary = path + ".tmp"
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    connection = sqlite3.connect(temporary)
+    connection.executescript(SCHEMA)
+
+    with open(os.path.join(directory, "people.csv"), encoding="utf-8") as f:
+        connection.executemany(
+            "INSERT OR IGNORE INTO people VALUES (?, ?, ?, ?)",
+            ((row["id"], row["name"], row["name"].lower(), row["birth"])
+             for row in csv.DictReader(f)))
+    with open(os.path.join(directory, "movies.csv"), encoding="utf-8") as f:
+        connection.executemany(
+            "INSERT OR IGNORE INTO movies VALUES (?, ?, ?)",
+            ((row["id"], row["title"], row["year"]) for row in csv.DictReader(f)))
+    with open(os.path.join(directory, "stars.csv"), encoding="utf-8") as f:
+        connection.executemany(
+            "INSERT OR IGNORE INTO stars VALUES (?, ?)",
+            ((row["person_id"], row["movie_id"]) for row in csv.DictReader(f)))
+
+    # Same as load_data, ignore stars of unknown people or movies
+    connection.execute(
+        "DELETE FROM stars WHERE person_id NOT IN (SELECT id FROM people) "
+        "OR movie_id NOT IN (SELECT id FROM movies)")
+    connection.executescript(INDEXES)
+    write_components(connection)
+
+    connection.execute("INSERT INTO meta VALUES ('stamp', ?)",
+                       (json.dumps([VERSION] + fingerprint(directory)),))
+    connection.execute("INSERT INTO meta VALUES ('ingests', '[]')")
+    connection.commit()
+    connection.close()
+    os.replace(temporary, path)
+
+
+def write_components(connection):
+    """
+    Fills the components and roots tables with a union find over the
+    stars table.
+    """
+    components = ComponentIndex()
+    for (person_id,) in connection.execute("SELECT id FROM people"):
+        components.add(person_id)
+
+    previous_movie = None
+    first = None
+    for movie_id, person_id in connection.execute(
+            "SELECT movie_id, person_id FROM stars ORDER BY movie_id"):
+        p = components.keys[person_id]
+        if movie_id != previous_movie:
+            previous_movie = movie_id
+            first = p
+        else:
+            components.union(first, p)
+    components.flatten()
+
+    ids = list(components.keys)
+    connection.executemany(
+        "INSERT INTO components VALUES (?, ?)",
+        ((person_id, ids[components.parent[p]])
+         for person_id, p in components.keys.items()))
+    connection.executemany(
+        "INSERT INTO roots VALUES (?, ?)",
+        ((person_id, components.size[p])
+         for person_id, p in components.keys.items() if components.parent[p] == p))
+
+
+def load_database(directory, cache_size=CACHE_SIZE):
+    """
+    Returns a SQLiteStore of the database in directory, importing the CSV
+    files into it first if it is missing or out of date.
+    """
+    path = os.path.join(directory, DATABASE)
+    if not database_is_current(path, directory):
+        import_csvs(directory, path)
+    return SQLiteStore(path, cache_size)
@@ -0,0 +1,112 @@
+"""
+Generates people.csv, movies.csv and stars.csv in the same format as the
+small and large directories, at any size, for benchmarking.
+
+Cast sizes follow a Pareto distribution and people are picked with Zipf
+weights, so like the real data most movies have a few stars, a few have
+huge casts, and a few prolific people are in a great many movies.
+
+Usage: python synthetic.py directory [--stars N] [--seed S]
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import random
+
+# Shape of the cast size distribution, lower means heavier tail
+CAST_ALPHA = 1.6
+
+# Largest cast of a single movie
+MAX_CAST = 200
+
+# Exponent of the Zipf weights of people, higher means more skewed
+PERSON_SKEW = 0.8
+
+# Number of stars per person and per movie, on average
+STARS_PER_PERSON = 4
+STARS_PER_MOVIE = 5
+
+SYLLABLES = ["al", "an", "ar", "be", "ca", "da", "el", "en", "fa", "ga",
+             "ha", "ia", "jo", "ka", "la", "ma", "na", "no", "or", "pa",
+             "ra", "ri", "sa", "se", "ta", "te", "to", "va", "wi", "ze"]
+
+
+def random_name(rng):
+    """
+    Returns a made up "First Last" name.
+    """
+    first = "".join(rng.choices(SYLLABLES, k=rng.randint(2, 3)))
+    last = "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+    return f"{first.capitalize()} {last.capitalize()}"
+
+
+def cast_size(rng):
+    return min(MAX_CAST, int(rng.paretovariate(CAST_ALPHA)) + 1)
+
+
+def generate(directory, stars, seed=0):
+    """
+    Writes the three CSV files with about stars rows in stars.csv to
+    directory, returns the (people, movies, stars) row counts.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    num_people = max(2, stars // STARS_PER_PERSON)
+
+    with open(os.path.join(directory, "people.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        f.write("id,name,birth\n")
+        writer = csv.writer(
+            f, quoting=csv.QUOTE_NONNUMERIC, lineterminator="\n")
+        for person in range(num_people):
+            writer.writerow([person + 1, random_name(rng), rng.randint(1900, 2010)])
+
+    # Person p is picked with weight 1 / (p + 1) ** PERSON_SKEW
+    weights = itertools.accumulate(
+        1 / (p + 1) ** PERSON_SKEW for p in range(num_people))
+    cum_weights = list(weights)
+    people = range(1, num_people + 1)
+
+    num_movies = 0
+    num_stars = 0
+    with open(os.path.join(directory, "movies.csv"), "w",
+              encoding="utf-8", newline="") as movies_file, \
+            open(os.path.join(directory, "stars.csv"), "w",
+                 encoding="utf-8", newline="") as stars_file:
+        movies_file.write("id,title,year\n")
+        stars_file.write("person_id,movie_id\n")
+        movies = csv.writer(
+            movies_file, quoting=csv.QUOTE_NONNUMERIC, lineterminator="\n")
+        credits = csv.writer(stars_file, lineterminator="\n")
+        while num_stars < stars:
+            num_movies += 1
+            title = " ".join(rng.choices(SYLLABLES, k=2)).title()
+            movies.writerow([num_movies, title, rng.randint(1920, 2020)])
+
+            size = min(cast_size(rng), stars - num_stars, num_people)
+            cast = set(rng.choices(people, cum_weights=cum_weights, k=size))
+            for person in cast:
+                credits.writerow([person, num_movies])
+            num_stars += len(cast)
+
+    return num_people, num_movies, num_stars
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic degrees data directory.")
+    parser.add_argument("directory")
+    parser.add_argument("--stars", type=int, default=10 ** 5,
+                        help="number of rows of stars.csv, 10^3 to 10^7")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    people, movies, stars = generate(args.directory, args.stars, args.seed)
+    print(f"Wrote {people} people, {movies} movies and {stars} stars "
+          f"to {args.directory}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,773 @@
+from degrees import *
+import degrees
+import ego
+import asyncio
+import contextlib
+import io
+import benchmark
+import json
+from components import ComponentIndex
+from nameindex import NameIndex
+import landmarks
+import levels
+import multiprocessing
+import nameindex
+import os
+import parallel
+import server
+import shutil
+import snapshot
+import sqlstore
+import synthetic
+import tempfile
+import time
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+
+# People in the small set
+HANKS = "158"
+HOFFMAN = "163"
+WATSON = "914612"
+
+
+class CopiedSmallTestCase(unittest.TestCase):
+    # Tests on a copy of the small set in a temporary directory, so the
+    # snapshot, database and index files written next to the CSV files stay
+    # out of the repo
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.directory = os.path.join(self.tmp, "small")
+        shutil.copytree("small", self.directory)
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        degrees.store = None
+        shutil.rmtree(self.tmp)
+
+
+class DictStorageTestCase(unittest.TestCase):
+    storage = "dict"
+    directory = "small"
+
+    def setUp(self):
+        load_data(self.directory, self.storage)
+
+    def test_shortest_path(self):
+        self.assertEqual(len(shortest_path(HANKS, HOFFMAN)), 3)
+
+    def test_not_connected(self):
+        self.assertIsNone(shortest_path(HANKS, WATSON))
+
+    def test_same_person(self):
+        self.assertEqual(shortest_path(HANKS, HANKS), [])
+
+    def test_names(self):
+        self.assertEqual(person_ids_for_name("tom hanks"), [HANKS])
+        self.assertEqual(person_ids_for_name("Nobody"), [])
+        self.assertEqual(person_for_id(HANKS)["name"], "Tom Hanks")
+        self.assertEqual(movie_for_id("112384")["title"], "Apollo 13")
+
+    def test_neighbors(self):
+        self.assertEqual(
+            neighbors_for_person("102"),
+            {('104257', '102'), ('104257', '129'), ('104257', '193'),
+             ('104257', '197'), ('112384', '102'), ('112384', '158'),
+             ('112384', '200'), ('112384', '641')})
+
+
+class CompactStorageTestCase(DictStorageTestCase):
+    storage = "compact"
+
+    def test_store_loaded(self):
+        self.assertIsNotNone(degrees.store)
+        self.assertEqual(degrees.store.num_people(), 16)
+        self.assertEqual(degrees.store.num_movies(), 5)
+
+    def test_path_is_valid(self):
+        path = shortest_path(HANKS, HOFFMAN)
+        person = HANKS
+        for movie, next_person in path:
+            self.assertIn((movie, next_person), neighbors_for_person(person))
+            person = next_person
+        self.assertEqual(person, HOFFMAN)
+
+
+class SnapshotStorageTestCase(CopiedSmallTestCase, CompactStorageTestCase):
+    storage = "snapshot"
+
+    def test_snapshot_written(self):
+        self.assertIsInstance(degrees.store, snapshot.MappedGraph)
+        self.assertTrue(snapshot.snapshot_is_current(self.directory))
+
+    def test_unknown_ids(self):
+        self.assertIsNone(degrees.store.person_index_for_id("1"))
+        self.assertIsNone(degrees.store.movie_index_for_id("999999"))
+
+    def test_rebuilt_when_csv_changes(self):
+        with open(os.path.join(self.directory, "people.csv"), "a") as f:
+            f.write('1,"New Person",2000\n')
+        self.assertFalse(snapshot.snapshot_is_current(self.directory))
+        load_data(self.directory, self.storage)
+        self.assertEqual(person_ids_for_name("new person"), ["1"])
+        self.assertTrue(snapshot.snapshot_is_current(self.directory))
+
+
+class SQLiteStorageTestCase(CopiedSmallTestCase, DictStorageTestCase):
+    storage = "sqlite"
+
+    def test_database_written(self):
+        self.assertIsInstance(degrees.store, sqlstore.SQLiteStore)
+        path = os.path.join(self.directory, sqlstore.DATABASE)
+        self.assertTrue(sqlstore.database_is_current(path, self.directory))
+
+    def test_bounded_cache(self):
+        degrees.store.cache_size = 2
+        for person_id in ["102", "129", HANKS, HOFFMAN]:
+            neighbors_for_person(person_id)
+        self.assertEqual(list(degrees.store.cache), [HANKS, HOFFMAN])
+
+    def test_all_searches(self):
+        for search in ["bfs", "bidirectional", "pruned", "cached"]:
+            self.assertEqual(len(find_path(HANKS, HOFFMAN, search)), 3)
+            self.assertIsNone(find_path(HANKS, WATSON, search))
+
+
+class BatchTestCase(unittest.TestCase):
+    pairs = [["Tom Hanks", "Dustin Hoffman"], ["Emma Watson", "Tom Hanks"],
+             ["Nobody", "Tom Hanks"], ["Tom Hanks"]]
+
+    def setUp(self):
+        load_data("small", "compact")
+
+    def tearDown(self):
+        degrees.store = None
+
+    def run_batch(self, workers):
+        output = io.StringIO()
+        run_batch(self.pairs, workers=workers, output=output)
+        return [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_results(self):
+        results = self.run_batch(1)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[0]["degrees"], 3)
+        self.assertEqual(results[1]["error"], "Not connected.")
+        self.assertEqual(results[2]["error"], "Person not found: Nobody.")
+        self.assertIn("row", results[3])
+
+    def test_pool_matches_serial(self):
+        self.assertEqual(self.run_batch(2), self.run_batch(1))
+
+
+class ServerTestCase(unittest.TestCase):
+    def setUp(self):
+        load_data("small", "compact")
+
+    def tearDown(self):
+        degrees.store = None
+
+    def query(self, requests, timeout=server.TIMEOUT):
+        """
+        Starts a server, sends each list of requests over its own connection
+        at the same time, and returns the responses and the final stats.
+        """
+        async def session():
+            query_server = server.QueryServer(workers=2, timeout=timeout)
+            listener = await query_server.start(port=0)
+            port = listener.sockets[0].getsockname()[1]
+
+            def track(client):
+                # The client runs in the server's process, so workers forked
+                # later must close its end of the connection too
+                query_server.sockets.add(client.writer.get_extra_info("socket"))
+
+            async def send(messages):
+                client = await server.Client.connect(port=port)
+                track(client)
+                responses = [await client.request(message) for message in messages]
+                await client.close()
+                return responses
+
+            try:
+                responses = await asyncio.gather(*map(send, requests))
+                await query_server.wait_closed()
+                return responses, query_server.statistics()
+            finally:
+                listener.close()
+                query_server.close()
+        return asyncio.run(session())
+
+    def test_shortest_path(self):
+        responses, stats = self.query([
+            [{"source": "Tom Hanks", "target": "Dustin Hoffman"}],
+            [{"source": "Emma Watson", "target": "Tom Hanks", "search": "bidirectional"},
+             {"source": "Nobody", "target": "Tom Hanks"}],
+        ])
+        self.assertEqual(responses[0][0]["degrees"], 3)
+        self.assertEqual(responses[0][0]["id"], 1)
+        self.assertEqual(responses[1][0]["error"], "Not connected.")
+        self.assertEqual(responses[1][1]["error"], "Person not found: Nobody.")
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["errors"], 2)
+        self.assertIsNotNone(stats["latency_ms"])
+
+    def test_bad_requests(self):
+        responses, stats = self.query([
+            [{"source": "Tom Hanks", "target": "Tom Hanks", "search": "dfs"},
+             {"op": "stats"}],
+        ])
+        self.assertEqual(responses[0][0]["error"], "Unknown search: dfs.")
+        self.assertEqual(responses[0][1]["stats"]["requests"], 0)
+
+    def test_bad_fields(self):
+        responses, stats = self.query([
+            [{"source": "Tom Hanks", "target": "Tom Hanks", "search": ["bfs"]},
+             {"target": "Tom Hanks"},
+             {"source": "Tom Hanks", "target": 1}],
+        ])
+        self.assertEqual(responses[0][0]["error"], "Unknown search: ['bfs'].")
+        self.assertEqual(responses[0][1]["error"], "Expected source and target names.")
+        self.assertEqual(responses[0][2]["id"], 3)
+        self.assertEqual(responses[0][2]["error"], "Expected source and target names.")
+        self.assertEqual(stats["requests"], 0)
+
+    def test_timeout(self):
+        responses, stats = self.query(
+            [[{"source": "Tom Hanks", "target": "Dustin Hoffman"}]], timeout=0)
+        self.assertEqual(responses[0][0]["error"], "Timed out.")
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["restarts"], 1)
+
+    def test_restart(self):
+        async def session():
+            query_server = server.QueryServer(workers=1)
+            listener = await query_server.start(port=0)
+            port = listener.sockets[0].getsockname()[1]
+            try:
+                client = await server.Client.connect(port=port)
+                # As in query, workers must close this end of the connection
+                query_server.sockets.add(client.writer.get_extra_info("socket"))
+                pool = query_server.pool
+                stuck = pool.submit(time.sleep, 60)
+                query_server.restart(pool)
+                self.assertIsNot(query_server.pool, pool)
+                self.assertRaises(BrokenProcessPool, stuck.result, 10)
+                response = await client.shortest_path("Tom Hanks", "Dustin Hoffman")
+                self.assertEqual(response["degrees"], 3)
+                await client.close()
+                # Workers started after the client connected must not keep it open
+                await asyncio.wait_for(query_server.wait_closed(), 10)
+            finally:
+                listener.close()
+                query_server.close()
+        asyncio.run(session())
+
+    def test_no_parallel_search(self):
+        responses, stats = self.query(
+            [[{"source": "Tom Hanks", "target": "Dustin Hoffman", "search": "parallel"}]])
+        self.assertEqual(responses[0][0]["error"], "Unknown search: parallel.")
+
+
+class AllPathsTestCase(unittest.TestCase):
+    def test_counts(self):
+        for storage in ["dict", "compact"]:
+            load_data("small", storage)
+            self.assertEqual(count_paths(HANKS, HOFFMAN), 1)
+            # Tom Hanks and Gary Sinise were in two movies together
+            self.assertEqual(count_paths(HANKS, "641"), 2)
+            self.assertEqual(count_paths("102", "398"), 2)
+            self.assertEqual(count_paths(WATSON, HANKS), 0)
+            self.assertEqual(count_paths(HANKS, HANKS), 1)
+        degrees.store = None
+
+    def test_paths(self):
+        load_data("small")
+        paths = list(shortest_paths(HANKS, "641"))
+        self.assertEqual(sorted(movie for [(movie, _)] in paths), ["109830", "112384"])
+        self.assertEqual(list(shortest_paths(HANKS, HOFFMAN)), [shortest_path(HANKS, HOFFMAN)])
+        self.assertEqual(list(shortest_paths(WATSON, HANKS)), [])
+        self.assertEqual(list(shortest_paths(HANKS, HANKS)), [[]])
+
+    def test_print_all_paths(self):
+        load_data("small")
+        searched = []
+        neighbors = degrees.neighbors_for_person
+        degrees.neighbors_for_person = lambda person_id: (
+            searched.append(person_id) or neighbors(person_id))
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                print_all_paths(HANKS, "641", 1)
+        finally:
+            degrees.neighbors_for_person = neighbors
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], "Number of shortest paths: 2.")
+        self.assertEqual(len(lines), 2)
+        # The paths are walked from the search the count came from
+        self.assertEqual(searched, [HANKS])
+
+    def test_paths_are_lazy(self):
+        load_data("small")
+        generator = shortest_paths("102", "398")
+        path = next(generator)
+        self.assertEqual(len(path), 2)
+        self.assertEqual(path[-1][1], "398")
+
+
+class ParallelTestCase(CopiedSmallTestCase):
+    def setUp(self):
+        super().setUp()
+        # Split even the smallest frontiers across the workers
+        self.min_chunk = parallel.MIN_CHUNK
+        parallel.MIN_CHUNK = 1
+
+    def tearDown(self):
+        parallel.MIN_CHUNK = self.min_chunk
+        close_parallel_search()
+        super().tearDown()
+
+    def test_same_as_serial(self):
+        for storage in ["compact", "snapshot"]:
+            load_data(self.directory, storage)
+            start_parallel_search(2)
+            graph = degrees.store
+            for source in graph.person_ids:
+                for target in graph.person_ids:
+                    self.assertEqual(find_path(source, target, "parallel"),
+                                     graph.shortest_path(source, target))
+
+    def test_restarted_after_ingest(self):
+        load_data("small", "compact")
+        self.assertIsNone(parallel_shortest_path(WATSON, HANKS))
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "stars.csv"), "w") as f:
+                f.write("person_id,movie_id\n914612,109830\n")
+            ingest(directory)
+        self.assertEqual(len(parallel_shortest_path(WATSON, HANKS)), 1)
+
+    def test_needs_graph(self):
+        load_data("small")
+        with self.assertRaises(Exception):
+            parallel_shortest_path(HANKS, HOFFMAN)
+
+    def test_two_searches(self):
+        load_data("small", "compact")
+        first = parallel.ParallelBFS(degrees.store, 2)
+        with parallel.ParallelBFS(degrees.store, 2) as second:
+            self.assertEqual(len(second.shortest_path(HANKS, HOFFMAN)), 3)
+        self.assertEqual(len(first.shortest_path(HANKS, HOFFMAN)), 3)
+        first.close()
+
+
+class EgoTestCase(unittest.TestCase):
+    def setUp(self):
+        load_data("small")
+
+    def edges(self, source, hops):
+        return {(frozenset([a, b]), movie) for a, movie, b in ego.ego_edges(source, hops)}
+
+    def test_zero_hops(self):
+        self.assertEqual(list(ego.ego_edges(HANKS, 0)), [])
+
+    def test_one_hop(self):
+        edges = list(ego.ego_edges(HANKS, 1))
+        self.assertEqual(len(edges), len(self.edges(HANKS, 1)))
+        for a, movie, b in edges:
+            self.assertIn(a, stars_for_movie(movie))
+            self.assertIn(b, stars_for_movie(movie))
+        people = set().union(*(pair for pair, _ in self.edges(HANKS, 1)))
+        self.assertEqual(people, {HANKS} | {person for _, person in neighbors_for_person(HANKS)})
+
+    def test_hops_grow(self):
+        self.assertLess(self.edges(HANKS, 1), self.edges(HANKS, 2))
+        self.assertNotIn(HOFFMAN, set().union(*(pair for pair, _ in self.edges(HANKS, 2))))
+        self.assertIn(HOFFMAN, set().union(*(pair for pair, _ in self.edges(HANKS, 3))))
+
+    def test_max_edges(self):
+        output = io.StringIO()
+        self.assertEqual(ego.write_ego(output, HANKS, 3, max_edges=5), 5)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], "person_id,movie_id,co_star_id")
+        self.assertEqual(len(lines), 6)
+
+
+class PrunedTestCase(unittest.TestCase):
+    def test_same_length_as_bfs(self):
+        load_data("small")
+        person_ids = list(people)
+        for storage in ["dict", "compact"]:
+            load_data("small", storage)
+            for source in person_ids:
+                for target in person_ids:
+                    path = pruned_shortest_path(source, target)
+                    expected = shortest_path(source, target)
+                    if expected is None:
+                        self.assertIsNone(path)
+                        continue
+                    self.assertEqual(len(path), len(expected))
+                    person = source
+                    for movie, next_person in path:
+                        self.assertIn(person, stars_for_movie(movie))
+                        self.assertIn(next_person, stars_for_movie(movie))
+                        person = next_person
+                    self.assertEqual(person, target)
+        degrees.store = None
+
+
+class TreeCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        load_data("small")
+
+    def test_same_length_as_bfs(self):
+        for source in people:
+            for target in people:
+                path = cached_shortest_path(source, target)
+                expected = shortest_path(source, target)
+                if expected is None:
+                    self.assertIsNone(path)
+                else:
+                    self.assertEqual(len(path), len(expected))
+        self.assertEqual(len(degrees.tree_cache), len(people))
+
+    def test_eviction(self):
+        cache = BFSTreeCache(max_bytes=1)
+        cache.shortest_path(HANKS, HOFFMAN, neighbors_for_person)
+        cache.shortest_path(HOFFMAN, HANKS, neighbors_for_person)
+        self.assertEqual(len(cache), 1)
+        self.assertIn(HOFFMAN, cache)
+        self.assertNotIn(HANKS, cache)
+
+    def test_cleared_on_load(self):
+        cached_shortest_path(HANKS, HOFFMAN)
+        load_data("small")
+        self.assertEqual(len(degrees.tree_cache), 0)
+
+
+class LandmarkTestCase(CopiedSmallTestCase):
+    def setUp(self):
+        super().setUp()
+        load_data(self.directory, "compact")
+
+    def check_same_length_as_bfs(self):
+        for source in degrees.store.person_ids:
+            for target in degrees.store.person_ids:
+                path = landmark_shortest_path(source, target)
+                expected = shortest_path(source, target)
+                if expected is None:
+                    self.assertIsNone(path)
+                else:
+                    self.assertEqual(len(path), len(expected))
+
+    def test_degree_landmarks(self):
+        load_landmarks(self.directory, 2)
+        self.check_same_length_as_bfs()
+
+    def test_farthest_landmarks(self):
+        load_landmarks(self.directory, 3, "farthest")
+        self.check_same_length_as_bfs()
+
+    def test_index_saved(self):
+        load_landmarks(self.directory, 2)
+        saved = landmarks.read_landmark_index(
+            self.directory, degrees.store.num_people(), 2)
+        self.assertEqual(saved.landmarks, degrees.landmark_index.landmarks)
+        self.assertEqual(list(saved.distances),
+                         list(degrees.landmark_index.distances))
+
+    def test_rebuilt_when_settings_change(self):
+        load_landmarks(self.directory, 2)
+        self.assertEqual(len(degrees.landmark_index.landmarks), 2)
+        load_landmarks(self.directory, 5, "farthest")
+        self.assertEqual(degrees.landmark_index.method, "farthest")
+        self.assertIsNone(landmarks.read_landmark_index(
+            self.directory, degrees.store.num_people(), 2))
+        saved = landmarks.read_landmark_index(
+            self.directory, degrees.store.num_people(), 5, "farthest")
+        self.assertEqual(saved.landmarks, degrees.landmark_index.landmarks)
+        self.assertGreater(len(saved.landmarks), 2)
+        self.check_same_length_as_bfs()
+
+    def test_needs_landmarks(self):
+        self.assertRaises(Exception, landmark_shortest_path, HANKS, HOFFMAN)
+
+
+class ComponentsTestCase(CopiedSmallTestCase):
+    def test_statistics(self):
+        for storage in STORAGES:
+            load_data(self.directory, storage)
+            self.assertEqual(degrees.components.statistics(), {
+                "people": 16, "components": 2, "largest": 15,
+                "isolated": 1, "sizes": {15: 1, 1: 1}})
+
+    def test_connected(self):
+        for storage in STORAGES:
+            load_data(self.directory, storage)
+            self.assertTrue(degrees.components.connected(HANKS, HOFFMAN))
+            self.assertFalse(degrees.components.connected(HANKS, WATSON))
+            self.assertEqual(degrees.components.component_size(WATSON), 1)
+            self.assertIsNone(find_path(HANKS, WATSON))
+            self.assertEqual(len(find_path(HANKS, HOFFMAN, "bidirectional")), 3)
+
+    def test_union(self):
+        index = ComponentIndex()
+        for person_id in "abcd":
+            index.add(person_id)
+        index.union(0, 1)
+        index.union(2, 1)
+        self.assertTrue(index.connected("a", "c"))
+        self.assertFalse(index.connected("a", "d"))
+        self.assertEqual(index.component_size("b"), 3)
+
+
+class NameIndexTestCase(CopiedSmallTestCase):
+    def test_prefix(self):
+        for storage in STORAGES:
+            load_data(self.directory, storage)
+            self.assertEqual(sorted(person_ids_for_prefix("tom ")),
+                             ["129", HANKS])
+            self.assertEqual(person_ids_for_prefix("TOM", limit=1), ["129"])
+            self.assertEqual(person_ids_for_prefix("zz"), [])
+
+    def test_fuzzy(self):
+        for storage in STORAGES:
+            load_data(self.directory, storage)
+            self.assertEqual(suggest_names("Tom Hnaks")[0], "Tom Hanks")
+            self.assertEqual(suggest_names("dustin hofman", 1),
+                             ["Dustin Hoffman"])
+            self.assertEqual(suggest_names("qqqq"), [])
+
+    def test_add(self):
+        index = NameIndex(["kevin bacon"])
+        index.add("kevin costner")
+        index.add("kevin bacon")
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.prefix("kevin"), ["kevin bacon", "kevin costner"])
+        self.assertEqual(index.fuzzy("kevin costnr", 1), ["kevin costner"])
+
+    def test_fuzzy_bounded(self):
+        # Names sharing most of their trigrams, so the scan has to be cut
+        index = NameIndex([f"kevin bacon {i}" for i in range(200)] + ["kevin baker"])
+        scan, candidates = nameindex.MAX_SCAN, nameindex.MAX_CANDIDATES
+        nameindex.MAX_SCAN, nameindex.MAX_CANDIDATES = 50, 10
+        try:
+            self.assertEqual(index.fuzzy("kevin bakr", 1), ["kevin baker"])
+            self.assertEqual(len(index.fuzzy("kevin bacon", 20)), 10)
+        finally:
+            nameindex.MAX_SCAN, nameindex.MAX_CANDIDATES = scan, candidates
+
+
+class LevelsTestCase(unittest.TestCase):
+    def setUp(self):
+        load_data("small", "compact")
+        self.graph = degrees.store
+        self.source = self.graph.person_index_for_id(HANKS)
+
+    def tearDown(self):
+        degrees.store = None
+
+    def test_counts_match_bfs(self):
+        distances = landmarks.hop_distances(self.graph, self.source)
+        counts = [list(distances).count(d) for d in range(max(distances) + 1)]
+        self.assertEqual(levels.level_counts(self.graph, self.source), counts)
+        self.assertEqual(levels.within(self.graph, self.source, 1), counts[0] + counts[1])
+        self.assertEqual(levels.within(self.graph, self.source, 100), 15)
+
+    def test_at_distance(self):
+        distances = landmarks.hop_distances(self.graph, self.source)
+        for k in range(5):
+            self.assertEqual(
+                sorted(levels.at_distance(self.graph, self.source, k)),
+                sorted(self.graph.person_ids[p]
+                       for p, d in enumerate(distances) if d == k))
+
+    def test_isolated(self):
+        watson = self.graph.person_index_for_id(WATSON)
+        self.assertEqual(levels.level_counts(self.graph, watson), [1])
+
+
+class SyntheticTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.counts = synthetic.generate(self.tmp, 2000, seed=1)
+
+    def tearDown(self):
+        degrees.store = None
+        shutil.rmtree(self.tmp)
+
+    def test_same_schema(self):
+        for name in ["people.csv", "movies.csv", "stars.csv"]:
+            with open(os.path.join(self.tmp, name)) as f, \
+                    open(os.path.join("small", name)) as expected:
+                self.assertEqual(f.readline(), expected.readline())
+        self.assertEqual(self.counts[2], 2000)
+
+    def test_loads(self):
+        load_data(self.tmp, "compact")
+        stats = degrees.components.statistics()
+        self.assertEqual(stats["people"], self.counts[0])
+        self.assertEqual(len(degrees.store.person_movies), 2000)
+
+    def test_benchmark(self):
+        report = benchmark.measure(self.tmp, "compact", ["bfs"], 5, 0)
+        self.assertGreater(report["peak_rss"], 0)
+        self.assertEqual(set(report["searches"]["bfs"]["latency_ms"]),
+                         {"p50", "p90", "p99", "max"})
+        self.assertEqual(set(report["fuzzy_ms"]), {"p50", "p90", "p99", "max"})
+
+
+class IngestTestCase(CopiedSmallTestCase):
+    def setUp(self):
+        super().setUp()
+        # Emma Watson and a new person join Tom Hanks in a new movie
+        self.delta = os.path.join(self.tmp, "delta")
+        os.mkdir(self.delta)
+        self.write("people.csv", 'id,name,birth\n705,"Robin Wright",1966\n'
+                   '1,"Daniel Radcliffe",1989\n')
+        self.write("movies.csv", 'id,title,year\n2,"New Movie",2020\n')
+        self.write("stars.csv", "person_id,movie_id\n914612,2\n1,2\n158,2\n"
+                   "158,2\n999,2\n")
+
+    def write(self, name, text):
+        with open(os.path.join(self.delta, name), "w") as f:
+            f.write(text)
+
+    def test_ingest(self):
+        for storage in STORAGES:
+            load_data(self.directory, storage)
+            suggest_names("Tom Hanks")
+            self.assertEqual(ingest(self.delta), (1, 1, 3))
+            self.assertEqual(person_ids_for_name("daniel radcliffe"), ["1"])
+            self.assertEqual(suggest_names("Daniel Radclife", 1),
+                             ["Daniel Radcliffe"])
+            self.assertTrue(degrees.components.connected(HOFFMAN, WATSON))
+            self.assertEqual(degrees.components.component_size(WATSON), 17)
+            self.assertEqual(len(find_path(HOFFMAN, WATSON)), 4)
+            self.assertEqual(len(find_path(WATSON, "1", "pruned")), 1)
+
+    def test_reload_after_ingest(self):
+        for storage in ["dict", "compact", "snapshot"]:
+            load_data(self.directory, storage)
+            self.assertEqual(ingest(self.delta), (1, 1, 3))
+            load_data(self.directory, storage)
+            self.assertEqual(person_ids_for_name("daniel radcliffe"), [])
+            self.assertEqual(degrees.components.statistics()["people"], 16)
+            self.assertEqual(ingest(self.delta), (1, 1, 3))
+
+    def test_database_keeps_ingest(self):
+        load_data(self.directory, "sqlite")
+        self.assertEqual(ingest(self.delta), (1, 1, 3))
+        path = os.path.join(self.directory, sqlstore.DATABASE)
+        self.assertTrue(sqlstore.database_is_current(path, self.directory))
+
+        # Reloading opens the same database, ingesting again adds nothing
+        load_data(self.directory, "sqlite")
+        self.assertEqual(person_ids_for_name("daniel radcliffe"), ["1"])
+        self.assertEqual(degrees.components.statistics()["people"], 17)
+        self.assertEqual(ingest(self.delta), (0, 0, 0))
+
+        # Changing an ingested file imports the CSV files again
+        self.write("movies.csv", 'id,title,year\n2,"New Movie",2021\n')
+        self.assertFalse(sqlstore.database_is_current(path, self.directory))
+        load_data(self.directory, "sqlite")
+        self.assertEqual(person_ids_for_name("daniel radcliffe"), [])
+        self.assertEqual(ingest(self.delta), (1, 1, 3))
+
+    def test_cache_invalidation(self):
+        load_data(self.directory)
+        cached_shortest_path(HANKS, HOFFMAN)
+        cached_shortest_path(WATSON, WATSON)
+
+        # Tom Cruise and Demi Moore are both two steps from Tom Hanks
+        shutil.rmtree(self.delta)
+        os.mkdir(self.delta)
+        self.write("movies.csv", 'id,title,year\n3,"Sequel",1995\n')
+        self.write("stars.csv", "person_id,movie_id\n129,3\n193,3\n")
+        ingest(self.delta)
+        self.assertIn(HANKS, degrees.tree_cache)
+
+        # Emma Watson joining Tom Hanks changes both trees
+        self.write("stars.csv", "person_id,movie_id\n914612,3\n")
+        ingest(self.delta)
+        self.assertNotIn(HANKS, degrees.tree_cache)
+        self.assertNotIn(WATSON, degrees.tree_cache)
+        self.assertEqual(len(cached_shortest_path(HANKS, WATSON)), 3)
+
+    def test_landmarks_recomputed(self):
+        load_data(self.directory, "compact")
+        load_landmarks(self.directory, 2)
+        ingest(self.delta)
+        self.assertIsNone(degrees.landmark_index)
+        load_landmarks(self.directory, 2)
+        self.assertEqual(len(landmark_shortest_path(HOFFMAN, WATSON)), 4)
+
+    def test_levels_after_ingest(self):
+        load_data(self.directory, "snapshot")
+        ingest(self.delta)
+        source = degrees.store.person_index_for_id(WATSON)
+        self.assertEqual(levels.within(degrees.store, source, 100), 17)
+
+    def test_spawned_workers_ingest(self):
+        # Workers that are not forked must ingest the same directories
+        spawn = multiprocessing.get_context("spawn")
+        query = (["Daniel Radcliffe", "Tom Hanks"], "bfs")
+        for storage in STORAGES:
+            load_data(self.directory, storage)
+            ingest(self.delta)
+            with spawn.Pool(2, initializer=load_worker,
+                            initargs=(self.directory, storage, [self.delta])) as pool:
+                results = pool.map(answer_query, [query] * 2, chunksize=1)
+            self.assertEqual([result["degrees"] for result in results], [1, 1])
+
+
+class FrontierTestCase(unittest.TestCase):
+    def test_queue_order(self):
+        frontier = QueueFrontier()
+        for state in "abc":
+            frontier.add(Node(state, None, None))
+        self.assertEqual([frontier.remove().state for _ in range(3)],
+                         ["a", "b", "c"])
+        self.assertTrue(frontier.empty())
+
+    def test_stack_order(self):
+        frontier = StackFrontier()
+        for state in "abc":
+            frontier.add(Node(state, None, None))
+        self.assertEqual([frontier.remove().state for _ in range(3)],
+                         ["c", "b", "a"])
+
+    def test_contains_state(self):
+        frontier = QueueFrontier()
+        frontier.add(Node("a", None, None))
+        frontier.add(Node("a", None, None))
+        self.assertTrue(frontier.contains_state("a"))
+        frontier.remove()
+        self.assertTrue(frontier.contains_state("a"))
+        frontier.remove()
+        self.assertFalse(frontier.contains_state("a"))
+        self.assertRaises(Exception, frontier.remove)
+
+
+class BidirectionalTestCase(unittest.TestCase):
+    def setUp(self):
+        load_data("small")
+
+    def test_same_length_as_bfs(self):
+        for source in people:
+            for target in people:
+                path = bidirectional_shortest_path(source, target)
+                expected = shortest_path(source, target)
+                if expected is None:
+                    self.assertIsNone(path)
+                    continue
+                self.assertEqual(len(path), len(expected))
+                person = source
+                for movie, next_person in path:
+                    self.assertIn((movie, next_person),
+                                  neighbors_for_person(person))
+                    person = next_person
+                self.assertEqual(person, target)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Tic Tac Toe rules for many boards at once, with NumPy.
+
+A batch of N boards is an (N, 9) int8 array, cell (i, j) of a board being
+column 3 * i + j: 1 for X, -1 for O and 0 for empty. Every function works
+on the whole batch with array operations rather than a loop over boards:
+a line is won by X if its three cells sum to 3, by O if they sum to -3.
+"""
+
+import numpy as np
+
+from players import X, O, EMPTY
+
+# Cells of the three rows, three columns and two diagonals
+LINES = np.array([[0, 1, 2], [3, 4, 5], [6, 7, 8],
+                  [0, 3, 6], [1, 4, 7], [2, 5, 8],
+                  [0, 4, 8], [2, 4, 6]])
+
+CODES = {X: 1, O: -1, EMPTY: 0}
+
+
+def from_boards(boards):
+    """
+    Returns the (N, 9) array of a list of list of lists boards.
+    """
+    return np.array([[CODES[cell] for row in board for cell in row]
+                     for board in boards], dtype=np.int8).reshape(-1, 9)
+
+
+def to_board(cells):
+    """
+    Returns the list of lists board of one row of a batch.
+    """
+    symbols = {1: X, -1: O, 0: EMPTY}
+    return [[symbols[int(cells[3 * i + j])] for j in range(3)] for i in range(3)]
+
+
+def line_sums(boards):
+    """
+    Returns the (N, 8) sums of the cells of every line of every board.
+    """
+    return boards[:, LINES].sum(axis=2, dtype=np.int8)
+
+
+def winners(boards):
+    """
+    Returns 1 for the boards X has won, -1 for those O has won, 0 otherwise.
+    """
+    sums = line_sums(boards)
+    return (sums == 3).any(axis=1).astype(np.int8) - (sums == -3).any(axis=1)
+
+
+def players(boards):
+    """
+    Returns 1 for the boards where X has the next turn, -1 for O.
+    """
+    return np.where(boards.sum(axis=1) > 0, -1, 1).astype(np.int8)
+
+
+def evaluate(boards):
+    """
+    Returns (winners, terminals, utilities, moves) for every board:
+    winners as from winners, terminals True where the game is over,
+    utilities 1 if X has won, -1 if O has, 0 otherwise, and moves an
+    (N, 9) mask of the cells that can be played, none once it is over.
+    """
+    won = winners(boards)
+    empty = boards == 0
+    terminals = (won != 0) | ~empty.any(axis=1)
+    # The utility of a board is its winner in this encoding
+    return won, terminals, won.copy(), empty & ~terminals[:, None]
@@ -0,0 +1,156 @@
+"""
+Tic Tac Toe engine on bitboards.
+
+A position is two 9 bit integers, the cells held by X and the cells held
+by O, cell (i, j) being bit 3 * i + j. Wins are found by table lookup and
+moves made with a bitwise or, so the search makes no copies of boards.
+from_board and to_board convert to and from the lists of lists used by
+tictactoe.py, and minimax takes and returns the same as tictactoe.minimax.
+"""
+
+from players import X, O, EMPTY
+
+# Every cell set
+FULL = 0b111111111
+
+# Masks of the three rows, three columns and two diagonals
+LINES = [0b000000111, 0b000111000, 0b111000000,
+         0b001001001, 0b010010010, 0b100100100,
+         0b100010001, 0b001010100]
+
+# WINNING[mask] is True if the cells in mask include a whole line
+WINNING = [any(mask & line == line for line in LINES) for mask in range(FULL + 1)]
+
+# COUNT[mask] is the number of cells in mask
+COUNT = [bin(mask).count("1") for mask in range(FULL + 1)]
+
+# Cells tried first by the search, the centre, then the corners, then the edges
+ORDER = [4, 0, 2, 6, 8, 1, 3, 5, 7]
+
+# MOVES[empty] is the tuple of the bits of the cells in empty, in ORDER
+MOVES = [tuple(1 << cell for cell in ORDER if empty & 1 << cell)
+         for empty in range(FULL + 1)]
+
+
+def from_board(board):
+    """
+    Returns the (x, o) bitboards of a list of lists board.
+    """
+    x = o = 0
+    for i in range(3):
+        for j in range(3):
+            if board[i][j] == X:
+                x |= 1 << (3 * i + j)
+            elif board[i][j] == O:
+                o |= 1 << (3 * i + j)
+    return x, o
+
+
+def to_board(x, o):
+    """
+    Returns the list of lists board of the (x, o) bitboards.
+    """
+    return [[X if x >> (3 * i + j) & 1 else O if o >> (3 * i + j) & 1 else EMPTY
+             for j in range(3)] for i in range(3)]
+
+
+def player(x, o):
+    """
+    Returns the player who has the next turn.
+    """
+    return X if COUNT[x] == COUNT[o] else O
+
+
+def actions(x, o):
+    """
+    Returns the (i, j) cells still empty.
+    """
+    empty = FULL & ~(x | o)
+    return {divmod(cell, 3) for cell in range(9) if empty >> cell & 1}
+
+
+def result(x, o, action):
+    """
+    Returns the (x, o) bitboards after the current player takes cell (i, j).
+    """
+    bit = 1 << (3 * action[0] + action[1])
+    if (x | o) & bit:
+        raise Exception("The action is not a legal move")
+    if COUNT[x] == COUNT[o]:
+        return x | bit, o
+    return x, o | bit
+
+
+def winner(x, o):
+    """
+    Returns the winner of the game, if there is one.
+    """
+    if WINNING[x]:
+        return X
+    if WINNING[o]:
+        return O
+    return None
+
+
+def terminal(x, o):
+    """
+    Returns True if a player has a line or the board is full.
+    """
+    return WINNING[x] or WINNING[o] or x | o == FULL
+
+
+def utility(x, o):
+    """
+    Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+    """
+    return 1 if WINNING[x] else -1 if WINNING[o] else 0
+
+
+def negamax(own, other, alpha, beta):
+    """
+    Returns the value of the position for the player to move, who holds
+    own, with alpha beta pruning: exact if between alpha and beta, else
+    alpha if it is at most alpha and beta if it is at least beta.
+    """
+    if WINNING[other]:
+        return -1
+    empty = FULL & ~(own | other)
+    if not empty:
+        return 0
+    for bit in MOVES[empty]:
+        value = -negamax(other, own | bit, -beta, -alpha)
+        if value > alpha:
+            alpha = value
+            if alpha >= beta:
+                break
+    return alpha
+
+
+def best_move(x, o):
+    """
+    Returns the cell number of an optimal move for the player to move, or
+    None if the game is over.
+    """
+    if WINNING[x] or WINNING[o]:
+        return None
+    own, other = (x, o) if COUNT[x] == COUNT[o] else (o, x)
+    best = None
+    # Values are between -1 and 1, so a win can not be bettered
+    alpha = -2
+    for bit in MOVES[FULL & ~(x | o)]:
+        value = -negamax(other, own | bit, -1, -alpha)
+        if value > alpha:
+            alpha = value
+            best = bit.bit_length() - 1
+            if alpha == 1:
+                break
+    return best
+
+
+def minimax(board):
+    """
+    Returns the optimal action for the current player on the list of lists
+    board, or None if the game is over, the same as tictactoe.minimax.
+    """
+    cell = best_move(*from_board(board))
+    return None if cell is None else divmod(cell, 3)
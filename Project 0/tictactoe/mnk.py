@@ -0,0 +1,314 @@
+"""
+Engine for m,n,k games: Tic Tac Toe on a board of m rows and n columns,
+won by the first player to get k in a row.
+
+Beyond 3x3 the game tree is far too big to search to the end, so moves are
+chosen by iterative deepening alpha beta search: it searches one move
+deeper each time, scores the positions where it stops by their open lines,
+and when the time budget runs out returns the best move of the deepest
+search it finished. Moves are tried in the order most likely to cause
+cutoffs: the best move found before, then killer moves, which caused a
+cutoff at the same depth, then by history, how often they caused cutoffs.
+
+A position is two bitboards as in bitboard.py, cell (i, j) being bit
+n * i + j of the first player's and of the second player's.
+
+Usage: python mnk.py m n k [--seconds S]
+"""
+
+import argparse
+import math
+import time
+
+from players import X, O, EMPTY
+
+# Score of a won position, less the number of moves it took so quicker
+# wins score higher, above any score of the heuristic
+WIN = 10 ** 9
+
+# Default time budget of a move, in seconds
+SECONDS = 1.0
+
+# Number of lines evaluate may score between looks at the clock, so the
+# clock is looked at every CHECK_LINES // len(lines) positions, more often
+# on bigger boards where each position takes longer
+CHECK_LINES = 4096
+
+# Boards with up to this many cells are searched over every empty cell,
+# bigger ones only over the cells next to those already taken
+SMALL = 16
+
+# Kinds of value in the transposition table
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class TimeUp(Exception):
+    """
+    Raised inside the search when the time budget has run out.
+    """
+
+
+class Game():
+    """
+    Rules and search of the m,n,k game with m rows, n columns and k in a
+    row to win.
+    """
+
+    def __init__(self, m=3, n=3, k=3):
+        if m < 1 or n < 1 or not 1 <= k <= max(m, n):
+            raise ValueError("k must be between 1 and the board's longer side")
+        self.m = m
+        self.n = n
+        self.k = k
+        self.cells = m * n
+        self.full = (1 << self.cells) - 1
+
+        # Masks of every run of k cells in a row, column or diagonal
+        self.lines = []
+        for di, dj in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+            for i in range(m):
+                for j in range(n):
+                    end_i, end_j = i + di * (k - 1), j + dj * (k - 1)
+                    if 0 <= end_i < m and 0 <= end_j < n:
+                        self.lines.append(sum(
+                            1 << (n * (i + di * s) + j + dj * s) for s in range(k)))
+        self.lines_through = [[line for line in self.lines if line >> c & 1]
+                              for c in range(self.cells)]
+        self.check_every = max(1, CHECK_LINES // len(self.lines))
+
+        # Cells of the first and last columns, for shifting bitboards
+        self.first_column = sum(1 << (n * i) for i in range(m))
+        self.last_column = self.first_column << (n - 1)
+
+        # Heuristic score of a line held by one player, by cells held
+        self.scores = [0] + [10 ** c for c in range(1, k)]
+
+        self.nodes = 0
+        self.deadline = math.inf
+        self.depth_reached = 0
+        self.transpositions = {}
+        self.killers = []
+        self.history = []
+
+    def initial_state(self):
+        return [[EMPTY] * self.n for _ in range(self.m)]
+
+    def from_board(self, board):
+        """
+        Returns the (x, o) bitboards of a list of lists board.
+        """
+        x = o = 0
+        for i in range(self.m):
+            for j in range(self.n):
+                if board[i][j] == X:
+                    x |= 1 << (self.n * i + j)
+                elif board[i][j] == O:
+                    o |= 1 << (self.n * i + j)
+        return x, o
+
+    def to_board(self, x, o):
+        """
+        Returns the list of lists board of the (x, o) bitboards.
+        """
+        board = self.initial_state()
+        for c in range(self.cells):
+            if x >> c & 1:
+                board[c // self.n][c % self.n] = X
+            elif o >> c & 1:
+                board[c // self.n][c % self.n] = O
+        return board
+
+    def has_line(self, stones, cell=None):
+        """
+        Returns True if stones hold a whole line, through cell if given.
+        """
+        lines = self.lines if cell is None else self.lines_through[cell]
+        return any(stones & line == line for line in lines)
+
+    def winner(self, board):
+        x, o = self.from_board(board)
+        if self.has_line(x):
+            return X
+        if self.has_line(o):
+            return O
+        return None
+
+    def terminal(self, board):
+        x, o = self.from_board(board)
+        return self.has_line(x) or self.has_line(o) or x | o == self.full
+
+    def evaluate(self, own, other):
+        """
+        Returns the heuristic score of a position for the player to move,
+        who holds own: lines still open to a player count for them, more
+        the more of their cells they already hold.
+        """
+        score = 0
+        for line in self.lines:
+            mine = own & line
+            theirs = other & line
+            if not theirs:
+                score += self.scores[bin(mine).count("1")]
+            elif not mine:
+                score -= self.scores[bin(theirs).count("1")]
+        return score
+
+    def candidates(self, own, other):
+        """
+        Returns the cells worth trying: every empty cell on small boards,
+        otherwise the empty cells next to a taken one.
+        """
+        taken = own | other
+        if self.cells <= SMALL:
+            empty = self.full & ~taken
+        elif not taken:
+            return [self.n * (self.m // 2) + self.n // 2]
+        else:
+            row = (taken | (taken & ~self.last_column) << 1
+                   | (taken & ~self.first_column) >> 1)
+            empty = (row | row << self.n | row >> self.n) & self.full & ~taken
+        return [c for c in range(self.cells) if empty >> c & 1]
+
+    def ordered_moves(self, own, other, ply, first):
+        """
+        Returns the candidate cells, first and the killer moves of ply at
+        the front, the rest by history.
+        """
+        killers = self.killers[ply]
+        return sorted(
+            self.candidates(own, other),
+            key=lambda c: (c != first, c not in killers, -self.history[c]))
+
+    def negamax(self, own, other, depth, ply, alpha, beta, last):
+        """
+        Returns the score of the position for the player to move, who holds
+        own, searching depth more moves. last is the cell the other player
+        just took. The score is exact if between alpha and beta, otherwise
+        a bound, as with tictactoe.alphabeta.
+        """
+        if last is not None and self.has_line(other, last):
+            return ply - WIN
+        if own | other == self.full:
+            return 0
+
+        self.nodes += 1
+        if self.nodes % self.check_every == 0 and time.perf_counter() > self.deadline:
+            raise TimeUp()
+        if depth == 0:
+            return self.evaluate(own, other)
+
+        key = (own, other)
+        first = None
+        if key in self.transpositions:
+            entry_depth, value, kind, move = self.transpositions[key]
+            if entry_depth >= depth and (
+                    kind == EXACT or (kind == LOWER and value >= beta)
+                    or (kind == UPPER and value <= alpha)):
+                return value
+            first = move
+
+        original_alpha = alpha
+        best = -math.inf
+        best_move = None
+        for c in self.ordered_moves(own, other, ply, first):
+            value = -self.negamax(other, own | 1 << c, depth - 1, ply + 1,
+                                  -beta, -alpha, c)
+            if value > best:
+                best, best_move = value, c
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                if c not in self.killers[ply]:
+                    self.killers[ply] = [c, self.killers[ply][0]]
+                self.history[c] += depth * depth
+                break
+
+        if best <= original_alpha:
+            kind = UPPER
+        elif best >= beta:
+            kind = LOWER
+        else:
+            kind = EXACT
+        self.transpositions[key] = (depth, best, kind, best_move)
+        return best
+
+    def best_move(self, x, o, seconds=SECONDS, max_depth=None):
+        """
+        Returns the cell number of the best move found within seconds for
+        the player to move, or None if the game is over. Searches at most
+        max_depth moves ahead, by default to the end of the game.
+        """
+        if self.has_line(x) or self.has_line(o) or x | o == self.full:
+            return None
+        first_player = bin(x).count("1") == bin(o).count("1")
+        own, other = (x, o) if first_player else (o, x)
+        empty = self.cells - bin(x | o).count("1")
+        if max_depth is None:
+            max_depth = empty
+
+        self.deadline = time.perf_counter() + seconds
+        self.nodes = 0
+        self.depth_reached = 0
+        self.transpositions = {}
+        self.killers = [[None, None] for _ in range(self.cells + 1)]
+        self.history = [0] * self.cells
+
+        moves = self.ordered_moves(own, other, 0, None)
+        best = moves[0]
+        for depth in range(1, min(max_depth, empty) + 1):
+            try:
+                alpha = -math.inf
+                scores = {}
+                for c in moves:
+                    value = -self.negamax(other, own | 1 << c, depth - 1, 1,
+                                          -math.inf, -alpha, c)
+                    scores[c] = value
+                    if value > alpha:
+                        alpha = value
+            except TimeUp:
+                break
+            # The best move first next time, and the rest by score
+            moves.sort(key=lambda c: -scores[c])
+            best = moves[0]
+            self.depth_reached = depth
+            # A forced win or loss is found, searching deeper won't change it
+            if abs(alpha) > WIN - self.cells - 1:
+                break
+        return best
+
+    def minimax(self, board, seconds=SECONDS, max_depth=None):
+        """
+        Returns the best action (i, j) found for the current player on the
+        list of lists board, or None if the game is over.
+        """
+        cell = self.best_move(*self.from_board(board), seconds, max_depth)
+        return None if cell is None else divmod(cell, self.n)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Watch the engine play an m,n,k game against itself.")
+    parser.add_argument("m", type=int)
+    parser.add_argument("n", type=int)
+    parser.add_argument("k", type=int)
+    parser.add_argument("--seconds", type=float, default=SECONDS,
+                        help="time budget of each move")
+    args = parser.parse_args()
+
+    game = Game(args.m, args.n, args.k)
+    board = game.initial_state()
+    turn = X
+    while not game.terminal(board):
+        i, j = game.minimax(board, args.seconds)
+        board[i][j] = turn
+        print(f"{turn} takes ({i}, {j}), searched {game.depth_reached} moves ahead.")
+        for row in board:
+            print(" ".join(cell or "." for cell in row))
+        turn = O if turn == X else X
+    winner = game.winner(board)
+    print("Tie." if winner is None else f"{winner} wins.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""
+Marks of the Tic Tac Toe players and of an empty cell, kept apart from
+tictactoe.py so the modules it imports can use them too.
+"""
+
+X = "X"
+O = "O"
+EMPTY = None
@@ -1,6 +1,7 @@
 import pygame
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import tictactoe as ttt
 
@@ -11,136 +12,186 @@ size = width, height = 600, 400
 black = (0, 0, 0)
 white = (255, 255, 255)
 
+# Most frames drawn per second, the loop sleeps the rest of the time
+FPS = 30
+
+# Shortest time the computer is shown thinking, in seconds
+AI_DELAY = 0.5
+
 screen = pygame.display.set_mode(size)
+clock = pygame.time.Clock()
 
 mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
 moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
 
+# Computes the computer's moves in the background, so the window keeps
+# responding while it thinks
+executor = ThreadPoolExecutor(max_workers=1)
+
+# Layout
+titleArea = pygame.Rect(0, 0, width, 65)
+playXButton = pygame.Rect((width / 8), (height / 2), width / 4, 50)
+playOButton = pygame.Rect(5 * (width / 8), (height / 2), width / 4, 50)
+againButton = pygame.Rect(width / 3, height - 65, width / 3, 50)
+tile_size = 80
+tile_origin = (width / 2 - (1.5 * tile_size),
+               height / 2 - (1.5 * tile_size))
+tiles = [[pygame.Rect(tile_origin[0] + j * tile_size,
+                      tile_origin[1] + i * tile_size,
+                      tile_size, tile_size)
+          for j in range(3)] for i in range(3)]
+
 user = None
 board = ttt.initial_state()
-ai_turn = False
+
+# Future of the computer's move while it is thinking, else None
+ai_move = None
+ai_started = 0
+
+# Title on screen and whether the play again button is, so they are
+# redrawn only when they change
+shown_title = None
+shown_again = False
+
+
+def draw_button(rect, label):
+    """
+    Draws a white button with a label, returns its area.
+    """
+    text = mediumFont.render(label, True, black)
+    textRect = text.get_rect()
+    textRect.center = rect.center
+    pygame.draw.rect(screen, white, rect)
+    screen.blit(text, textRect)
+    return rect
+
+
+def draw_title(title):
+    """
+    Draws the title over the previous one, returns the area it covers.
+    """
+    screen.fill(black, titleArea)
+    text = largeFont.render(title, True, white)
+    textRect = text.get_rect()
+    textRect.center = ((width / 2), 30 if user else 50)
+    screen.blit(text, textRect)
+    return titleArea
+
+
+def draw_tile(i, j):
+    """
+    Draws tile (i, j) of the board, returns its area.
+    """
+    rect = tiles[i][j]
+    screen.fill(black, rect)
+    pygame.draw.rect(screen, white, rect, 3)
+    if board[i][j] != ttt.EMPTY:
+        move = moveFont.render(board[i][j], True, white)
+        moveRect = move.get_rect()
+        moveRect.center = rect.center
+        screen.blit(move, moveRect)
+    return rect
+
+
+def game_title():
+    if ttt.terminal(board):
+        winner = ttt.winner(board)
+        if winner is None:
+            return f"Game Over: Tie."
+        return f"Game Over: {winner} wins."
+    elif user == ttt.player(board):
+        return f"Play as {user}"
+    return f"Computer thinking..."
+
+
+def draw_screen():
+    """
+    Draws the whole window for the current state.
+    """
+    global shown_title, shown_again
+    screen.fill(black)
+    if user is None:
+        shown_again = False
+        shown_title = "Play Tic-Tac-Toe"
+        draw_title(shown_title)
+        draw_button(playXButton, "Play as X")
+        draw_button(playOButton, "Play as O")
+        return
+    for i in range(3):
+        for j in range(3):
+            draw_tile(i, j)
+    shown_title = game_title()
+    draw_title(shown_title)
+    shown_again = ttt.terminal(board)
+    if shown_again:
+        draw_button(againButton, "Play Again")
+
+
+draw_screen()
+pygame.display.flip()
 
 while True:
 
+    click = None
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             sys.exit()
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            click = event.pos
 
-    screen.fill(black)
+    # Areas of the window changed this frame
+    dirty = []
 
     # Let user choose a player.
     if user is None:
-
-        # Draw title
-        title = largeFont.render("Play Tic-Tac-Toe", True, white)
-        titleRect = title.get_rect()
-        titleRect.center = ((width / 2), 50)
-        screen.blit(title, titleRect)
-
-        # Draw buttons
-        playXButton = pygame.Rect((width / 8), (height / 2), width / 4, 50)
-        playX = mediumFont.render("Play as X", True, black)
-        playXRect = playX.get_rect()
-        playXRect.center = playXButton.center
-        pygame.draw.rect(screen, white, playXButton)
-        screen.blit(playX, playXRect)
-
-        playOButton = pygame.Rect(5 * (width / 8), (height / 2), width / 4, 50)
-        playO = mediumFont.render("Play as O", True, black)
-        playORect = playO.get_rect()
-        playORect.center = playOButton.center
-        pygame.draw.rect(screen, white, playOButton)
-        screen.blit(playO, playORect)
-
-        # Check if button is clicked
-        click, _, _ = pygame.mouse.get_pressed()
-        if click == 1:
-            mouse = pygame.mouse.get_pos()
-            if playXButton.collidepoint(mouse):
-                time.sleep(0.2)
-                user = ttt.X
-            elif playOButton.collidepoint(mouse):
-                time.sleep(0.2)
-                user = ttt.O
+        if click and playXButton.collidepoint(click):
+            user = ttt.X
+        elif click and playOButton.collidepoint(click):
+            user = ttt.O
+        if user is not None:
+            draw_screen()
+            dirty.append(screen.get_rect())
 
     else:
-
-        # Draw game board
-        tile_size = 80
-        tile_origin = (width / 2 - (1.5 * tile_size),
-                       height / 2 - (1.5 * tile_size))
-        tiles = []
-        for i in range(3):
-            row = []
-            for j in range(3):
-                rect = pygame.Rect(
-                    tile_origin[0] + j * tile_size,
-                    tile_origin[1] + i * tile_size,
-                    tile_size, tile_size
-                )
-                pygame.draw.rect(screen, white, rect, 3)
-
-                if board[i][j] != ttt.EMPTY:
-                    move = moveFont.render(board[i][j], True, white)
-                    moveRect = move.get_rect()
-                    moveRect.center = rect.center
-                    screen.blit(move, moveRect)
-                row.append(rect)
-            tiles.append(row)
-
         game_over = ttt.terminal(board)
         player = ttt.player(board)
 
-        # Show title
-        if game_over:
-            winner = ttt.winner(board)
-            if winner is None:
-                title = f"Game Over: Tie."
-            else:
-                title = f"Game Over: {winner} wins."
-        elif user == player:
-            title = f"Play as {user}"
-        else:
-            title = f"Computer thinking..."
-        title = largeFont.render(title, True, white)
-        titleRect = title.get_rect()
-        titleRect.center = ((width / 2), 30)
-        screen.blit(title, titleRect)
-
-        # Check for AI move
+        # Start the computer thinking, then play its move once it is ready
         if user != player and not game_over:
-            if ai_turn:
-                time.sleep(0.5)
-                move = ttt.minimax(board)
-                board = ttt.result(board, move)
-                ai_turn = False
-            else:
-                ai_turn = True
+            if ai_move is None:
+                ai_move = executor.submit(ttt.minimax, board)
+                ai_started = time.monotonic()
+            elif ai_move.done() and time.monotonic() - ai_started >= AI_DELAY:
+                i, j = ai_move.result()
+                ai_move = None
+                board = ttt.result(board, (i, j))
+                dirty.append(draw_tile(i, j))
 
         # Check for a user move
-        click, _, _ = pygame.mouse.get_pressed()
-        if click == 1 and user == player and not game_over:
-            mouse = pygame.mouse.get_pos()
+        if click and user == player and not game_over:
             for i in range(3):
                 for j in range(3):
-                    if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
+                    if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(click)):
                         board = ttt.result(board, (i, j))
-
-        if game_over:
-            againButton = pygame.Rect(width / 3, height - 65, width / 3, 50)
-            again = mediumFont.render("Play Again", True, black)
-            againRect = again.get_rect()
-            againRect.center = againButton.center
-            pygame.draw.rect(screen, white, againButton)
-            screen.blit(again, againRect)
-            click, _, _ = pygame.mouse.get_pressed()
-            if click == 1:
-                mouse = pygame.mouse.get_pos()
-                if againButton.collidepoint(mouse):
-                    time.sleep(0.2)
-                    user = None
-                    board = ttt.initial_state()
-                    ai_turn = False
-
-    pygame.display.flip()
+                        dirty.append(draw_tile(i, j))
+
+        if game_over and click and againButton.collidepoint(click):
+            user = None
+            board = ttt.initial_state()
+            ai_move = None
+            draw_screen()
+            dirty.append(screen.get_rect())
+        else:
+            # Show title
+            title = game_title()
+            if title != shown_title:
+                shown_title = title
+                dirty.append(draw_title(title))
+            if ttt.terminal(board) and not shown_again:
+                shown_again = True
+                dirty.append(draw_button(againButton, "Play Again"))
+
+    if dirty:
+        pygame.display.update(dirty)
+    clock.tick(FPS)
@@ -0,0 +1,77 @@
+"""
+Symmetries of the Tic Tac Toe board.
+
+Rotating or reflecting a board does not change its value, so a search only
+needs to solve one board of each set of up to 8 symmetric boards. canonical
+picks the same representative for all of them, and the transform taking a
+board to it, so moves found on the representative can be mapped back.
+
+Cells are numbered 3 * i + j. A transform is a permutation t of the cell
+numbers: cell k of the transformed board is cell t[k] of the original.
+"""
+
+
+def permutation(move):
+    """
+    Returns the transform moving each cell (i, j) to move(i, j).
+    """
+    t = [0] * 9
+    for i in range(3):
+        for j in range(3):
+            new_i, new_j = move(i, j)
+            t[3 * new_i + new_j] = 3 * i + j
+    return tuple(t)
+
+
+# The identity, the three rotations and the four reflections
+TRANSFORMS = [
+    permutation(lambda i, j: (i, j)),
+    permutation(lambda i, j: (j, 2 - i)),
+    permutation(lambda i, j: (2 - i, 2 - j)),
+    permutation(lambda i, j: (2 - j, i)),
+    permutation(lambda i, j: (i, 2 - j)),
+    permutation(lambda i, j: (2 - i, j)),
+    permutation(lambda i, j: (j, i)),
+    permutation(lambda i, j: (2 - j, 2 - i)),
+]
+
+# INVERSES[n] undoes TRANSFORMS[n]
+INVERSES = [tuple(t.index(k) for k in range(9)) for t in TRANSFORMS]
+
+
+def transform_board(board, n):
+    """
+    Returns the board transformed by TRANSFORMS[n].
+    """
+    t = TRANSFORMS[n]
+    return [[board[t[3 * i + j] // 3][t[3 * i + j] % 3] for j in range(3)]
+            for i in range(3)]
+
+
+def canonical(board):
+    """
+    Returns (key, n): key is the same hashable value for every board
+    symmetric to this one, and TRANSFORMS[n] takes the board to the
+    representative it stands for.
+    """
+    # Empty cells become "" so that every cell compares
+    cells = [cell or "" for row in board for cell in row]
+    images = [tuple(cells[k] for k in t) for t in TRANSFORMS]
+    key = min(images)
+    return key, images.index(key)
+
+
+def to_canonical(action, n):
+    """
+    Returns the cell of the representative that action (i, j) on the
+    board maps to under TRANSFORMS[n].
+    """
+    return divmod(INVERSES[n][3 * action[0] + action[1]], 3)
+
+
+def from_canonical(action, n):
+    """
+    Returns the cell of the board that action (i, j) on its representative
+    comes from, undoing to_canonical.
+    """
+    return divmod(TRANSFORMS[n][3 * action[0] + action[1]], 3)
@@ -0,0 +1,141 @@
+"""
+Perfect play table for Tic Tac Toe.
+
+Every position that can come up in a game is solved once, by retrograde
+analysis: the positions are listed by number of moves played, then valued
+from the last layer back to the empty board, each from the already valued
+positions one move later. The value and best move of each are saved to a
+file as one byte per board, at the board's base 3 index, so looking up a
+move is a single read once the file is loaded.
+
+Usage: python table.py [path]
+"""
+
+import os
+import sys
+
+from bitboard import FULL, MOVES, WINNING, from_board
+
+# Default path of the table, next to this file
+TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tictactoe.table")
+
+# First bytes of a table file, changed whenever the format changes
+MAGIC = b"TTT\x01"
+
+# Number of boards, each cell being empty, X or O
+SIZE = 3 ** 9
+
+# Entry of the boards that can not come up in a game
+UNREACHABLE = 0xFF
+
+# Move stored for boards where the game is over
+NO_MOVE = 9
+
+# TERNARY[mask] is the base 3 number with a 1 digit for each cell in mask
+TERNARY = [sum(3 ** cell for cell in range(9) if mask >> cell & 1)
+           for mask in range(FULL + 1)]
+
+
+def board_index(x, o):
+    """
+    Returns the base 3 index of the (x, o) bitboards, digit 3 * i + j
+    being 0 for an empty cell (i, j), 1 for X and 2 for O.
+    """
+    return TERNARY[x] + 2 * TERNARY[o]
+
+
+def solve():
+    """
+    Returns the table as a bytearray of SIZE entries, each entry being
+    (value + 1) << 4 | move, value the utility under perfect play and move
+    the cell number of an optimal move, NO_MOVE if the game is over.
+    """
+    # Every reachable position, by number of moves played
+    layers = [[(0, 0)]]
+    seen = {(0, 0)}
+    for moves in range(9):
+        layer = []
+        for x, o in layers[-1]:
+            if WINNING[x] or WINNING[o]:
+                continue
+            for bit in MOVES[FULL & ~(x | o)]:
+                child = (x | bit, o) if moves % 2 == 0 else (x, o | bit)
+                if child not in seen:
+                    seen.add(child)
+                    layer.append(child)
+        layers.append(layer)
+
+    table = bytearray([UNREACHABLE]) * SIZE
+    values = {}
+    for moves in reversed(range(len(layers))):
+        for x, o in layers[moves]:
+            if WINNING[x] or WINNING[o] or x | o == FULL:
+                value = 1 if WINNING[x] else -1 if WINNING[o] else 0
+                move = NO_MOVE
+            else:
+                # X maximises and O minimises, the first optimal cell wins
+                sign = 1 if moves % 2 == 0 else -1
+                value, move = None, None
+                for bit in MOVES[FULL & ~(x | o)]:
+                    child = (x | bit, o) if sign == 1 else (x, o | bit)
+                    if value is None or sign * values[child] > sign * value:
+                        value, move = values[child], bit.bit_length() - 1
+            values[(x, o)] = value
+            table[board_index(x, o)] = (value + 1) << 4 | move
+    return table
+
+
+def write_table(path=TABLE, table=None):
+    """
+    Saves the table, solving the game first if not given, to path.
+    """
+    if table is None:
+        table = solve()
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC + table)
+    os.replace(temporary, path)
+
+
+def load_table(path=TABLE):
+    """
+    Returns the table saved at path, solving the game and saving the table
+    first if the file is missing or not a table.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:len(MAGIC)] == MAGIC and len(data) == len(MAGIC) + SIZE:
+            return data[len(MAGIC):]
+    except OSError:
+        pass
+    table = bytes(solve())
+    try:
+        write_table(path, table)
+    except OSError:
+        # Still usable, just solved again next time
+        pass
+    return table
+
+
+def lookup(table, board):
+    """
+    Returns (value, action) of a list of lists board from the table, action
+    being None if the game is over. Returns None if the board can not come
+    up in a game.
+    """
+    entry = table[board_index(*from_board(board))]
+    if entry == UNREACHABLE:
+        return None
+    move = entry & 0xF
+    return (entry >> 4) - 1, None if move == NO_MOVE else divmod(move, 3)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else TABLE
+    write_table(path)
+    print(f"Wrote {path}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+from tictactoe import *
+import tictactoe
+import batch
+import bitboard
+import mnk
+import os
+import symmetry
+import table
+import tempfile
+import time
+import unittest
+
+
+# Solve the game into a temporary file rather than next to the code
+directory = tempfile.TemporaryDirectory()
+tictactoe.perfect_play = table.load_table(os.path.join(directory.name, "tictactoe.table"))
+
+
+def board_key(board):
+    """
+    Returns a hashable copy of the board.
+    """
+    return tuple(tuple(row) for row in board)
+
+
+def value(board, memo={}):
+    """
+    Plain minimax value of a board, to check the searches against.
+    """
+    key = board_key(board)
+    if key not in memo:
+        if terminal(board):
+            memo[key] = utility(board)
+        else:
+            values = [value(result(board, action)) for action in actions(board)]
+            memo[key] = max(values) if player(board) == X else min(values)
+    return memo[key]
+
+
+def reachable_boards():
+    """
+    Returns every board that can come up in a game, terminal or not.
+    """
+    boards = {}
+    stack = [initial_state()]
+    while stack:
+        board = stack.pop()
+        key = board_key(board)
+        if key in boards:
+            continue
+        boards[key] = board
+        if not terminal(board):
+            stack.extend(result(board, action) for action in actions(board))
+    return list(boards.values())
+
+
+class TestMinimax(unittest.TestCase):
+    def setUp(self):
+        tictactoe.transpositions.clear()
+
+    def test_optimal_everywhere(self):
+        boards = reachable_boards()
+        self.assertEqual(len(boards), 5478)
+        for board in boards:
+            move = minimax(board)
+            if terminal(board):
+                self.assertIsNone(move)
+                continue
+            self.assertIn(move, actions(board))
+            self.assertEqual(value(result(board, move)), value(board))
+
+    def test_takes_win(self):
+        board = [[X, X, EMPTY],
+                 [O, O, EMPTY],
+                 [EMPTY, EMPTY, EMPTY]]
+        self.assertEqual(minimax(board), (0, 2))
+
+    def test_blocks(self):
+        board = [[X, X, EMPTY],
+                 [EMPTY, O, EMPTY],
+                 [EMPTY, EMPTY, EMPTY]]
+        self.assertEqual(minimax(board), (0, 2))
+
+    def test_empty_board_search_is_small(self):
+        tictactoe.nodes_searched = 0
+        move = alphabeta(initial_state(), -1, 1)[1]
+        self.assertEqual(value(result(initial_state(), move)), 0)
+        # A full minimax visits 549946 boards
+        self.assertLess(tictactoe.nodes_searched, 1000)
+
+
+class TestBitboard(unittest.TestCase):
+    def test_same_as_lists(self):
+        for board in reachable_boards():
+            x, o = bitboard.from_board(board)
+            self.assertEqual(bitboard.to_board(x, o), board)
+            self.assertEqual(bitboard.winner(x, o), winner(board))
+            self.assertEqual(bitboard.terminal(x, o), terminal(board))
+            self.assertEqual(bitboard.utility(x, o), utility(board))
+            if terminal(board):
+                continue
+            self.assertEqual(bitboard.player(x, o), player(board))
+            self.assertEqual(bitboard.actions(x, o), actions(board))
+            for action in actions(board):
+                self.assertEqual(bitboard.to_board(*bitboard.result(x, o, action)),
+                                 result(board, action))
+
+    def test_optimal_everywhere(self):
+        for board in reachable_boards():
+            move = bitboard.minimax(board)
+            if terminal(board):
+                self.assertIsNone(move)
+            else:
+                self.assertEqual(value(result(board, move)), value(board))
+
+    def test_illegal_move(self):
+        with self.assertRaises(Exception):
+            bitboard.result(1, 0, (0, 0))
+
+
+class TestTable(unittest.TestCase):
+    def test_values_and_moves(self):
+        perfect_play = table.solve()
+        for board in reachable_boards():
+            solved_value, move = table.lookup(perfect_play, board)
+            self.assertEqual(solved_value, value(board))
+            if terminal(board):
+                self.assertIsNone(move)
+            else:
+                self.assertEqual(value(result(board, move)), value(board))
+        self.assertEqual(sum(entry != table.UNREACHABLE for entry in perfect_play), 5478)
+
+    def test_unreachable(self):
+        board = [[X, X, EMPTY],
+                 [X, EMPTY, EMPTY],
+                 [EMPTY, EMPTY, EMPTY]]
+        self.assertIsNone(table.lookup(tictactoe.perfect_play, board))
+        # minimax falls back to searching
+        self.assertIn(minimax(board), actions(board))
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tictactoe.table")
+            solved = table.load_table(path)
+            self.assertEqual(os.path.getsize(path), len(table.MAGIC) + table.SIZE)
+            self.assertEqual(table.load_table(path), solved)
+
+            # Anything else in the file is replaced
+            with open(path, "wb") as f:
+                f.write(b"not a table")
+            self.assertEqual(table.load_table(path), solved)
+            self.assertEqual(os.path.getsize(path), len(table.MAGIC) + table.SIZE)
+
+
+class TestSymmetry(unittest.TestCase):
+    board = [[X, O, EMPTY],
+             [EMPTY, X, EMPTY],
+             [EMPTY, EMPTY, O]]
+
+    def test_transforms(self):
+        images = [symmetry.transform_board(self.board, n) for n in range(8)]
+        self.assertEqual(len({board_key(image) for image in images}), 8)
+        self.assertEqual(images[0], self.board)
+        for image in images:
+            self.assertEqual(symmetry.canonical(image)[0], symmetry.canonical(self.board)[0])
+
+    def test_canonical_board(self):
+        key, n = symmetry.canonical(self.board)
+        image = symmetry.transform_board(self.board, n)
+        self.assertEqual(symmetry.canonical(image), (key, 0))
+
+    def test_moves(self):
+        for n in range(8):
+            image = symmetry.transform_board(self.board, n)
+            for action in actions(self.board):
+                moved = symmetry.to_canonical(action, n)
+                self.assertEqual(symmetry.from_canonical(moved, n), action)
+                self.assertEqual(symmetry.transform_board(result(self.board, action), n),
+                                 result(image, moved))
+
+    def test_classes(self):
+        keys = {symmetry.canonical(board)[0] for board in reachable_boards()}
+        self.assertEqual(len(keys), 765)
+
+    def test_alphabeta_optimal(self):
+        # minimax answers these from the table, so search them directly,
+        # each with a fresh cache and then all with one shared cache
+        for shared in [False, True]:
+            tictactoe.transpositions.clear()
+            for board in reachable_boards():
+                if not shared:
+                    tictactoe.transpositions.clear()
+                board_value, move = alphabeta(board, -1, 1)
+                self.assertEqual(board_value, value(board))
+                if terminal(board):
+                    self.assertIsNone(move)
+                else:
+                    self.assertIn(move, actions(board))
+                    self.assertEqual(value(result(board, move)), value(board))
+
+    def test_smaller_cache(self):
+        tictactoe.transpositions.clear()
+        for board in reachable_boards():
+            alphabeta(board, -1, 1)
+        self.assertLessEqual(len(tictactoe.transpositions), 765)
+
+
+class TestMNK(unittest.TestCase):
+    def test_3_3_3_optimal(self):
+        game = mnk.Game()
+        for board in reachable_boards():
+            move = game.minimax(board, seconds=10)
+            if terminal(board):
+                self.assertIsNone(move)
+            else:
+                self.assertEqual(value(result(board, move)), value(board))
+
+    def test_takes_win(self):
+        game = mnk.Game(5, 5, 4)
+        board = game.initial_state()
+        for j in range(3):
+            board[2][j] = X
+            board[4][j] = O
+        self.assertEqual(game.minimax(board), (2, 3))
+
+    def test_blocks(self):
+        game = mnk.Game(7, 7, 4)
+        board = game.initial_state()
+        board[0][0] = X
+        for i in range(1, 4):
+            board[i][i] = O
+        board[6][6] = X
+        board[6][0] = X
+        # X to move, O wins next at (4, 4) unless X takes it
+        self.assertEqual(game.minimax(board), (4, 4))
+
+    def test_time_budget(self):
+        game = mnk.Game(7, 7, 5)
+        start = time.perf_counter()
+        move = game.minimax(game.initial_state(), seconds=0.2)
+        self.assertLess(time.perf_counter() - start, 0.25)
+        self.assertEqual(move, (3, 3))
+        self.assertGreaterEqual(game.depth_reached, 1)
+
+        # Each position takes longer to score on a bigger board
+        game = mnk.Game(19, 19, 5)
+        board = game.initial_state()
+        board[9][9] = X
+        board[9][10] = O
+        start = time.perf_counter()
+        game.minimax(board, seconds=0.05)
+        self.assertLess(time.perf_counter() - start, 0.075)
+
+    def test_board_conversion(self):
+        game = mnk.Game(3, 4, 3)
+        board = game.initial_state()
+        board[1][3] = X
+        board[2][0] = O
+        self.assertEqual(game.to_board(*game.from_board(board)), board)
+        self.assertEqual(game.from_board(board), (1 << 7, 1 << 8))
+
+    def test_bad_k(self):
+        with self.assertRaises(ValueError):
+            mnk.Game(3, 3, 4)
+
+
+class TestBatch(unittest.TestCase):
+    def test_same_as_one_by_one(self):
+        boards = reachable_boards()
+        cells = batch.from_boards(boards)
+        self.assertEqual(cells.shape, (5478, 9))
+        winners, terminals, utilities, moves = batch.evaluate(cells)
+        players = batch.players(cells)
+        codes = {X: 1, O: -1, None: 0}
+        for i, board in enumerate(boards):
+            self.assertEqual(batch.to_board(cells[i]), board)
+            self.assertEqual(winners[i], codes[winner(board)])
+            self.assertEqual(terminals[i], terminal(board))
+            self.assertEqual(utilities[i], utility(board))
+            legal = {divmod(int(c), 3) for c in moves[i].nonzero()[0]}
+            if terminal(board):
+                self.assertEqual(legal, set())
+            else:
+                self.assertEqual(legal, actions(board))
+                self.assertEqual(players[i], codes[player(board)])
+
+    def test_empty_batch(self):
+        winners, terminals, utilities, moves = batch.evaluate(batch.from_boards([]))
+        self.assertEqual(len(winners), 0)
+        self.assertEqual(moves.shape, (0, 9))
+
+
+class TestResult(unittest.TestCase):
+    def test_does_not_change_board(self):
+        board = initial_state()
+        new_board = result(board, (1, 1))
+        self.assertEqual(board, initial_state())
+        self.assertEqual(new_board[1][1], X)
+
+    def test_illegal_move(self):
+        with self.assertRaises(Exception):
+            result(result(initial_state(), (0, 0)), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
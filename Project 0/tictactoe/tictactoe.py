@@ -3,11 +3,10 @@ Tic Tac Toe Player
 """
 
 import math
-import copy
 
-X = "X"
-O = "O"
-EMPTY = None
+import table
+from players import X, O, EMPTY
+from symmetry import canonical, from_canonical, to_canonical
 
 
 def initial_state():
@@ -59,8 +58,8 @@ def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
-    # Copy the board
-    new_board = copy.deepcopy(board)
+    # Copy the board, the cells are immutable so copying the rows is enough
+    new_board = [list(row) for row in board]
 
     # check if the action is legal
     if board[action[0]][action[1]] != EMPTY:
@@ -155,6 +154,93 @@ def utility(board):
         return 0
 
 
+# Values of the boards searched so far, see alphabeta. Keyed by
+# symmetry.canonical, so rotated and reflected boards share one entry
+transpositions = {}
+
+# Kinds of value in transpositions: the exact value, or a bound on it
+# because the search of the board was cut off
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Cells tried first, the centre, then the corners, then the edges, as the
+# moves in more lines tend to be the better ones and cause earlier cutoffs
+MOVE_ORDER = [(1, 1), (0, 0), (0, 2), (2, 0), (2, 2),
+              (0, 1), (1, 0), (1, 2), (2, 1)]
+
+# Number of boards alphabeta has searched, for measuring
+nodes_searched = 0
+
+# Solved values and moves of every board, loaded by minimax when first used
+perfect_play = None
+
+
+def ordered_actions(board, first=None):
+    """
+    Returns the possible actions on the board as a list, in MOVE_ORDER
+    but with first, if possible, at the front.
+    """
+    moves = [(i, j) for i, j in MOVE_ORDER if board[i][j] == EMPTY]
+    if first in moves:
+        moves.remove(first)
+        moves.insert(0, first)
+    return moves
+
+
+def alphabeta(board, alpha, beta):
+    """
+    Returns (value, action) for the board, action being the optimal one
+    for the current player. The value is exact if between alpha and beta,
+    otherwise it is only a bound: at most alpha, or at least beta.
+    """
+    global nodes_searched
+    nodes_searched += 1
+
+    # Entries hold the move for the representative of the board's symmetries
+    key, n = canonical(board)
+    best_first = None
+    if key in transpositions:
+        value, kind, action = transpositions[key]
+        if action is not None:
+            action = from_canonical(action, n)
+        if (kind == EXACT or (kind == LOWER and value >= beta)
+                or (kind == UPPER and value <= alpha)):
+            return value, action
+        # Not enough to decide, but its best move is likely best again
+        best_first = action
+
+    if terminal(board):
+        value = utility(board)
+        transpositions[key] = (value, EXACT, None)
+        return value, None
+
+    turn = player(board)
+    original_alpha, original_beta = alpha, beta
+    best = -math.inf if turn == X else math.inf
+    best_action = None
+    for action in ordered_actions(board, best_first):
+        value = alphabeta(result(board, action), alpha, beta)[0]
+        if turn == X and value > best:
+            best, best_action = value, action
+            alpha = max(alpha, value)
+        elif turn == O and value < best:
+            best, best_action = value, action
+            beta = min(beta, value)
+        # The other player will never let the game reach this board
+        if alpha >= beta:
+            break
+
+    if best <= original_alpha:
+        kind = UPPER
+    elif best >= original_beta:
+        kind = LOWER
+    else:
+        kind = EXACT
+    transpositions[key] = (best, kind, to_canonical(best_action, n))
+    return best, best_action
+
+
 def minimax(board):
     """
     Returns the optimal action for the current player on the board.
@@ -163,32 +249,14 @@ def minimax(board):
     if terminal(board):
         return None
 
-    def recursive_minimax(board):
-        """ best_actions is a list that will go through recursion, can be added from anywhere. Returns the list of optimal actions the player should take."""
-        turn = player(board)
-        if turn == O:
-            best = float("inf")
-        else:
-            best = float("-inf")
-        # Base case
-        if terminal(board):
-            # No more actions to take, return end utility of board
-            return (None, utility(board))
-        # Get all the possible actions, uses depth first search
-        for action in actions(board):
-            path = recursive_minimax(
-                result(board, action)
-            )
-            if turn == O and path[1] < best:
-                best = path[1]
-                best_action = action
-            elif turn == X and path[1] > best:
-                best = path[1]
-                best_action = action
-
-        return (best_action, best)
-
-    # Else Return the best solution found using recursive function, which is the first in the tuple returned
-    return recursive_minimax(board)[0]
-
-
+    # Look the move up in the table of every board that can come up
+    global perfect_play
+    if perfect_play is None:
+        perfect_play = table.load_table()
+    solved = table.lookup(perfect_play, board)
+    if solved is not None:
+        return solved[1]
+
+    # Only boards no game can reach get here, so only they are searched.
+    # Utilities are between -1 and 1, so stop looking once a win is found
+    return alphabeta(board, -1, 1)[1]
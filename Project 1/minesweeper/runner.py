@@ -1,6 +1,6 @@
 import pygame
 import sys
-import time
+from concurrent.futures import ThreadPoolExecutor
 
 from minesweeper import Minesweeper, MinesweeperAI
 
@@ -13,10 +13,14 @@ BLACK = (0, 0, 0)
 GRAY = (180, 180, 180)
 WHITE = (255, 255, 255)
 
+# Most frames drawn per second, the loop sleeps the rest of the time
+FPS = 30
+
 # Create game
 pygame.init()
 size = width, height = 600, 400
 screen = pygame.display.set_mode(size)
+clock = pygame.time.Clock()
 
 # Fonts
 OPEN_SANS = "assets/fonts/OpenSans-Regular.ttf"
@@ -37,6 +41,22 @@ flag = pygame.transform.scale(flag, (cell_size, cell_size))
 mine = pygame.image.load("assets/images/mine.png")
 mine = pygame.transform.scale(mine, (cell_size, cell_size))
 
+# Layout
+cells = [[pygame.Rect(board_origin[0] + j * cell_size,
+                      board_origin[1] + i * cell_size,
+                      cell_size, cell_size)
+          for j in range(WIDTH)] for i in range(HEIGHT)]
+playButton = pygame.Rect((width / 4), (3 / 4) * height, width / 2, 50)
+aiButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+resetButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+textArea = pygame.Rect((2 / 3) * width, (2 / 3) * height - 25, width / 3, 50)
+
 # Create game and AI agent
 game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
 ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
@@ -49,13 +69,98 @@ lost = False
 # Show instructions initially
 instructions = True
 
-while True:
+# Runs the AI in the background, in order, so the window keeps responding
+# while it updates its knowledge or picks a move
+executor = ThreadPoolExecutor(max_workers=1)
 
-    # Check if game quit
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            sys.exit()
+# Future of the AI's move after the AI Move button is clicked, else None
+ai_move = None
+
+# Text on screen, so it is redrawn only when it changes
+shown_text = None
 
+
+def choose_ai_move(ai):
+    """
+    Returns (move, mines) for the AI's next move, mines being the cells
+    the AI knows are mines if it has no move left to make, else None.
+    """
+    move = ai.make_safe_move()
+    if move is None:
+        move = ai.make_random_move()
+        if move is None:
+            print("No moves left to make.")
+            return None, ai.mines.copy()
+        else:
+            print("No known safe moves, AI making random move.")
+    else:
+        print("AI making safe move.")
+    return move, None
+
+
+def draw_button(rect, label):
+    """
+    Draws a white button with a label, returns its area.
+    """
+    buttonText = mediumFont.render(label, True, BLACK)
+    buttonRect = buttonText.get_rect()
+    buttonRect.center = rect.center
+    pygame.draw.rect(screen, WHITE, rect)
+    screen.blit(buttonText, buttonRect)
+    return rect
+
+
+def draw_cell(i, j):
+    """
+    Draws cell (i, j) of the board, returns its area.
+    """
+    rect = cells[i][j]
+    pygame.draw.rect(screen, GRAY, rect)
+    pygame.draw.rect(screen, WHITE, rect, 3)
+
+    # Add a mine, flag, or number if needed
+    if game.is_mine((i, j)) and lost:
+        screen.blit(mine, rect)
+    elif (i, j) in flags:
+        screen.blit(flag, rect)
+    elif (i, j) in revealed:
+        neighbors = smallFont.render(
+            str(game.nearby_mines((i, j))),
+            True, BLACK
+        )
+        neighborsTextRect = neighbors.get_rect()
+        neighborsTextRect.center = rect.center
+        screen.blit(neighbors, neighborsTextRect)
+    return rect
+
+
+def draw_board():
+    """
+    Draws every cell of the board, returns the area they cover.
+    """
+    for i in range(HEIGHT):
+        for j in range(WIDTH):
+            draw_cell(i, j)
+    return cells[0][0].union(cells[HEIGHT - 1][WIDTH - 1])
+
+
+def draw_text(text):
+    """
+    Draws the text over the previous one, returns the area it covers.
+    """
+    screen.fill(BLACK, textArea)
+    text = mediumFont.render(text, True, WHITE)
+    textRect = text.get_rect()
+    textRect.center = ((5 / 6) * width, (2 / 3) * height)
+    screen.blit(text, textRect)
+    return textArea
+
+
+def draw_screen():
+    """
+    Draws the whole window for the current state.
+    """
+    global shown_text
     screen.fill(BLACK)
 
     # Show game instructions
@@ -80,143 +185,121 @@ while True:
             screen.blit(line, lineRect)
 
         # Play game button
-        buttonRect = pygame.Rect((width / 4), (3 / 4) * height, width / 2, 50)
-        buttonText = mediumFont.render("Play Game", True, BLACK)
-        buttonTextRect = buttonText.get_rect()
-        buttonTextRect.center = buttonRect.center
-        pygame.draw.rect(screen, WHITE, buttonRect)
-        screen.blit(buttonText, buttonTextRect)
-
-        # Check if play button clicked
-        click, _, _ = pygame.mouse.get_pressed()
-        if click == 1:
-            mouse = pygame.mouse.get_pos()
-            if buttonRect.collidepoint(mouse):
-                instructions = False
-                time.sleep(0.3)
-
-        pygame.display.flip()
-        continue
+        draw_button(playButton, "Play Game")
+        return
 
-    # Draw board
-    cells = []
-    for i in range(HEIGHT):
-        row = []
-        for j in range(WIDTH):
+    draw_board()
+    draw_button(aiButton, "AI Move")
+    draw_button(resetButton, "Reset")
+    shown_text = status()
+    draw_text(shown_text)
 
-            # Draw rectangle for cell
-            rect = pygame.Rect(
-                board_origin[0] + j * cell_size,
-                board_origin[1] + i * cell_size,
-                cell_size, cell_size
-            )
-            pygame.draw.rect(screen, GRAY, rect)
-            pygame.draw.rect(screen, WHITE, rect, 3)
-
-            # Add a mine, flag, or number if needed
-            if game.is_mine((i, j)) and lost:
-                screen.blit(mine, rect)
-            elif (i, j) in flags:
-                screen.blit(flag, rect)
-            elif (i, j) in revealed:
-                neighbors = smallFont.render(
-                    str(game.nearby_mines((i, j))),
-                    True, BLACK
-                )
-                neighborsTextRect = neighbors.get_rect()
-                neighborsTextRect.center = rect.center
-                screen.blit(neighbors, neighborsTextRect)
-
-            row.append(rect)
-        cells.append(row)
-
-    # AI Move button
-    aiButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("AI Move", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = aiButton.center
-    pygame.draw.rect(screen, WHITE, aiButton)
-    screen.blit(buttonText, buttonRect)
 
-    # Reset button
-    resetButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("Reset", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = resetButton.center
-    pygame.draw.rect(screen, WHITE, resetButton)
-    screen.blit(buttonText, buttonRect)
+def status():
+    return "Lost" if lost else "Won" if game.mines == flags else ""
 
-    # Display text
-    text = "Lost" if lost else "Won" if game.mines == flags else ""
-    text = mediumFont.render(text, True, WHITE)
-    textRect = text.get_rect()
-    textRect.center = ((5 / 6) * width, (2 / 3) * height)
-    screen.blit(text, textRect)
 
-    move = None
+draw_screen()
+pygame.display.flip()
 
-    left, _, right = pygame.mouse.get_pressed()
+while True:
+
+    # Check if game quit, and for clicks
+    left = right = None
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            sys.exit()
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            left = event.pos
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+            right = event.pos
+
+    # Areas of the window changed this frame
+    dirty = []
+
+    # Check if play button clicked
+    if instructions:
+        if left and playButton.collidepoint(left):
+            instructions = False
+            draw_screen()
+            dirty.append(screen.get_rect())
+        if dirty:
+            pygame.display.update(dirty)
+        clock.tick(FPS)
+        continue
+
+    # Cells to reveal this frame, the user's and the AI's
+    moves = []
 
     # Check for a right-click to toggle flagging
-    if right == 1 and not lost:
-        mouse = pygame.mouse.get_pos()
+    if right and not lost:
         for i in range(HEIGHT):
             for j in range(WIDTH):
-                if cells[i][j].collidepoint(mouse) and (i, j) not in revealed:
+                if cells[i][j].collidepoint(right) and (i, j) not in revealed:
                     if (i, j) in flags:
                         flags.remove((i, j))
                     else:
                         flags.add((i, j))
-                    time.sleep(0.2)
-
-    elif left == 1:
-        mouse = pygame.mouse.get_pos()
-
-        # If AI button clicked, make an AI move
-        if aiButton.collidepoint(mouse) and not lost:
-            move = ai.make_safe_move()
-            if move is None:
-                move = ai.make_random_move()
-                if move is None:
-                    flags = ai.mines.copy()
-                    print("No moves left to make.")
-                else:
-                    print("No known safe moves, AI making random move.")
-            else:
-                print("AI making safe move.")
-            time.sleep(0.2)
+                    dirty.append(draw_cell(i, j))
+
+    elif left:
+
+        # If AI button clicked, have the AI pick a move in the background
+        if aiButton.collidepoint(left):
+            if not lost and ai_move is None:
+                ai_move = executor.submit(choose_ai_move, ai)
 
         # Reset game state
-        elif resetButton.collidepoint(mouse):
+        elif resetButton.collidepoint(left):
             game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
             ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
             revealed = set()
             flags = set()
             lost = False
+            ai_move = None
+            draw_screen()
+            pygame.display.flip()
+            clock.tick(FPS)
             continue
 
         # User-made move
         elif not lost:
             for i in range(HEIGHT):
                 for j in range(WIDTH):
-                    if (cells[i][j].collidepoint(mouse)
+                    if (cells[i][j].collidepoint(left)
                             and (i, j) not in flags
                             and (i, j) not in revealed):
-                        move = (i, j)
+                        moves.append((i, j))
+
+    # Make the AI's move once it has picked one
+    if ai_move is not None and ai_move.done():
+        ai_choice, ai_mines = ai_move.result()
+        ai_move = None
+        if ai_mines is not None:
+            flags = ai_mines
+            dirty.append(draw_board())
+        else:
+            moves.append(ai_choice)
 
-    # Make move and update AI knowledge
-    if move:
+    # Make moves and update AI knowledge in the background
+    for move in moves:
+        if lost or move in revealed:
+            continue
         if game.is_mine(move):
             lost = True
+            dirty.append(draw_board())
         else:
             nearby = game.nearby_mines(move)
             revealed.add(move)
-            ai.add_knowledge(move, nearby)
+            dirty.append(draw_cell(*move))
+            executor.submit(ai.add_knowledge, move, nearby)
 
-    pygame.display.flip()
+    # Display text
+    text = status()
+    if text != shown_text:
+        shown_text = text
+        dirty.append(draw_text(text))
+
+    if dirty:
+        pygame.display.update(dirty)
+    clock.tick(FPS)